@@ -2,6 +2,87 @@ import numpy as np
 import rasterio
 from scipy.ndimage import convolve, gaussian_filter
 
+SOBEL_X = np.array([[-1, 0, 1], [-2, 0, 2], [-1, 0, 1]], dtype=np.float32)
+SOBEL_Y = np.array([[-1, -2, -1], [0, 0, 0], [1, 2, 1]], dtype=np.float32)
+
+# Prewitt kernels
+PREWITT_X = np.array([
+    [-1, 0, 1],
+    [-1, 0, 1],
+    [-1, 0, 1]
+], dtype=np.float32)
+
+PREWITT_Y = np.array([
+    [-1, -1, -1],
+    [0, 0, 0],
+    [1, 1, 1]
+], dtype=np.float32)
+
+# Roberts cross kernels
+ROBERTS_X = np.array([
+    [1, 0],
+    [0, -1]
+], dtype=np.float32)
+
+ROBERTS_Y = np.array([
+    [0, 1],
+    [-1, 0]
+], dtype=np.float32)
+
+def canny_gradients(band, sigma):
+    # Step 1: Gaussian smoothing
+    smoothed = gaussian_filter(band, sigma=sigma)
+    
+    # Step 2: Gradient calculation
+    grad_x = convolve(smoothed, SOBEL_X, mode='reflect')
+    grad_y = convolve(smoothed, SOBEL_Y, mode='reflect')
+    return grad_x, grad_y
+
+def canny_stats(band, sigma=1.0):
+    """
+    Whole-band gradient maximum that canny_enhance_band normalizes by
+    """
+    grad_x, grad_y = canny_gradients(band, sigma)
+    return {'mag_max': np.sqrt(grad_x**2 + grad_y**2).max()}
+
+def canny_enhance_band(band, sigma=1.0, low_threshold=0.1, high_threshold=0.2, alpha=0.5, stats=None):
+    """
+    stats (from canny_stats) lets a window of the band be normalized like the whole band
+    """
+    grad_x, grad_y = canny_gradients(band, sigma)
+    
+    magnitude = np.sqrt(grad_x**2 + grad_y**2)
+    
+    # Normalize magnitude
+    mag_max = magnitude.max() if stats is None else stats['mag_max']
+    if mag_max > 0:
+        magnitude = magnitude / mag_max
+    
+    # Step 3: Non-maximum suppression (simplified)
+    angle = np.arctan2(grad_y, grad_x)
+    
+    # Step 4: Double thresholding
+    strong_edges = magnitude > high_threshold
+    weak_edges = (magnitude >= low_threshold) & (magnitude <= high_threshold)
+    
+    # Combine edges
+    edges = strong_edges.astype(np.float32) + 0.5 * weak_edges.astype(np.float32)
+    
+    # Enhance original image with edges
+    return band + alpha * edges * magnitude
+
+def gradient_enhance_band(band, kernel_x, kernel_y, alpha=0.5):
+    grad_x = convolve(band, kernel_x, mode='reflect')
+    grad_y = convolve(band, kernel_y, mode='reflect')
+    gradient_magnitude = np.sqrt(grad_x**2 + grad_y**2)
+    return band + alpha * gradient_magnitude
+
+def prewitt_enhance_band(band, alpha=0.5):
+    return gradient_enhance_band(band, PREWITT_X, PREWITT_Y, alpha)
+
+def roberts_enhance_band(band, alpha=0.5):
+    return gradient_enhance_band(band, ROBERTS_X, ROBERTS_Y, alpha)
+
 def canny_edge_enhancement(infile='Image_HW2.tif', sigma=1.0, low_threshold=0.1, high_threshold=0.2, alpha=0.5, outfile=None):
     """
     Canny edge detection and enhancement
@@ -13,37 +94,6 @@ def canny_edge_enhancement(infile='Image_HW2.tif', sigma=1.0, low_threshold=0.1,
         profile = src.profile.copy()
         data = src.read().astype(np.float32)
     
-    def canny_enhance_band(band, sigma, low_thresh, high_thresh, alpha):
-        # Step 1: Gaussian smoothing
-        smoothed = gaussian_filter(band, sigma=sigma)
-        
-        # Step 2: Gradient calculation
-        sobel_x = np.array([[-1, 0, 1], [-2, 0, 2], [-1, 0, 1]], dtype=np.float32)
-        sobel_y = np.array([[-1, -2, -1], [0, 0, 0], [1, 2, 1]], dtype=np.float32)
-        
-        grad_x = convolve(smoothed, sobel_x, mode='reflect')
-        grad_y = convolve(smoothed, sobel_y, mode='reflect')
-        
-        magnitude = np.sqrt(grad_x**2 + grad_y**2)
-        
-        # Normalize magnitude
-        mag_max = magnitude.max()
-        if mag_max > 0:
-            magnitude = magnitude / mag_max
-        
-        # Step 3: Non-maximum suppression (simplified)
-        angle = np.arctan2(grad_y, grad_x)
-        
-        # Step 4: Double thresholding
-        strong_edges = magnitude > high_thresh
-        weak_edges = (magnitude >= low_thresh) & (magnitude <= high_thresh)
-        
-        # Combine edges
-        edges = strong_edges.astype(np.float32) + 0.5 * weak_edges.astype(np.float32)
-        
-        # Enhance original image with edges
-        return band + alpha * edges * magnitude
-    
     enhanced = np.empty_like(data)
     for b in range(data.shape[0]):
         enhanced[b] = canny_enhance_band(data[b], sigma, low_threshold, high_threshold, alpha)
@@ -66,25 +116,9 @@ def prewitt_edge_enhancement(infile='Image_HW2.tif', alpha=0.5, outfile=None):
         profile = src.profile.copy()
         data = src.read().astype(np.float32)
     
-    # Prewitt kernels
-    prewitt_x = np.array([
-        [-1, 0, 1],
-        [-1, 0, 1],
-        [-1, 0, 1]
-    ], dtype=np.float32)
-    
-    prewitt_y = np.array([
-        [-1, -1, -1],
-        [0, 0, 0],
-        [1, 1, 1]
-    ], dtype=np.float32)
-    
     enhanced = np.empty_like(data)
     for b in range(data.shape[0]):
-        grad_x = convolve(data[b], prewitt_x, mode='reflect')
-        grad_y = convolve(data[b], prewitt_y, mode='reflect')
-        gradient_magnitude = np.sqrt(grad_x**2 + grad_y**2)
-        enhanced[b] = data[b] + alpha * gradient_magnitude
+        enhanced[b] = prewitt_enhance_band(data[b], alpha)
     
     profile.update(dtype=rasterio.float32)
     with rasterio.open(outfile, 'w', **profile) as dst:
@@ -104,23 +138,9 @@ def roberts_cross_enhancement(infile='Image_HW2.tif', alpha=0.5, outfile=None):
         profile = src.profile.copy()
         data = src.read().astype(np.float32)
     
-    # Roberts cross kernels
-    roberts_x = np.array([
-        [1, 0],
-        [0, -1]
-    ], dtype=np.float32)
-    
-    roberts_y = np.array([
-        [0, 1],
-        [-1, 0]
-    ], dtype=np.float32)
-    
     enhanced = np.empty_like(data)
     for b in range(data.shape[0]):
-        grad_x = convolve(data[b], roberts_x, mode='reflect')
-        grad_y = convolve(data[b], roberts_y, mode='reflect')
-        gradient_magnitude = np.sqrt(grad_x**2 + grad_y**2)
-        enhanced[b] = data[b] + alpha * gradient_magnitude
+        enhanced[b] = roberts_enhance_band(data[b], alpha)
     
     profile.update(dtype=rasterio.float32)
     with rasterio.open(outfile, 'w', **profile) as dst:
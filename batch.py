@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Batch mode: one filter over many files, spread across a process pool
+
+    python batch.py sobel 'chips/*.tif' --param alpha=0.5 --workers 8 --outdir out --manifest run.csv
+
+Outputs are named <input stem>_<filter suffix>.tif. At most max_in_flight files
+are submitted at once, so memory stays bounded however many files match. The
+manifest (CSV or JSON, by extension) records status, timing and output per file.
+With --max-memory each worker process gets an equal share of the limit and
+plans its tiles to fit; the manifest then adds predicted and observed peak RSS.
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+import traceback
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from filter_registry import FILTERS, call_filter, default_params, output_name, parse_params
+from memory_planner import format_memory, gdal_env, measure_peak, parse_memory, peak_rss, plan_tiled
+
+MANIFEST_FIELDS = ['input', 'output', 'status', 'seconds', 'predicted_mb', 'peak_mb', 'error']
+
+
+def expand_inputs(inputs):
+    """
+    Files from a glob pattern, a file path, or a list of either, in order and without duplicates
+    """
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    files, seen = [], set()
+    for item in inputs:
+        for f in sorted(glob.glob(item)) if glob.has_magic(item) else [item]:
+            if f not in seen:
+                seen.add(f)
+                files.append(f)
+    return files
+
+
+def process_file(name, infile, params, outfile, tiled=False, mask_aware=False, max_memory=None):
+    """
+    Run one file in a worker process and report it as a manifest row
+    max_memory is this worker's share of the limit; the tile plan is fitted to it
+    """
+    start_time = time.time()
+    predicted = None
+    measured = {'peak': None}
+    try:
+        if tiled or max_memory is not None:
+            from tile_pipeline import run_tiled
+            kwargs = {'compute_workers': 1}
+            env = nullcontext()
+            if max_memory is not None:
+                plan = plan_tiled(name, infile, params, max_memory, workers=1)
+                predicted = plan['predicted']
+                kwargs.update(block_size=plan['block_size'], prefetch=plan['prefetch'],
+                              pending_writes=plan['pending_writes'])
+                env = gdal_env(plan)
+            with measure_peak() as measured, env:
+                run_tiled(name, infile, outfile, params, mask_aware=mask_aware, **kwargs)
+        else:
+            with measure_peak() as measured:
+                call_filter(name, infile, params, outfile)
+        status, error = 'SUCCESS', ''
+    except Exception as e:
+        status, error = 'ERROR', f"{e}\n{traceback.format_exc(limit=3)}"
+    return {'input': infile, 'output': outfile, 'status': status,
+            'seconds': round(time.time() - start_time, 3),
+            'predicted_mb': round(predicted / (1 << 20)) if predicted is not None else '',
+            'peak_mb': round(measured['peak'] / (1 << 20)) if measured['peak'] is not None else '',
+            'error': error}
+
+
+def check_output_clashes(files, outfiles):
+    """
+    Raise if two inputs (e.g. same stem in different folders) would write the same output
+    """
+    claimed = {}
+    clashes = []
+    for infile, outfile in zip(files, outfiles):
+        key = os.path.normcase(os.path.abspath(outfile))
+        if key in claimed:
+            clashes.append(f"{claimed[key]} and {infile} -> {outfile}")
+        else:
+            claimed[key] = infile
+    if clashes:
+        raise ValueError("inputs would overwrite each other's outputs; use separate --outdir runs or rename:\n  "
+                         + "\n  ".join(clashes[:10]) + (f"\n  ... {len(clashes) - 10} more" if len(clashes) > 10 else ""))
+
+
+def write_manifest(rows, manifest):
+    if manifest.endswith('.json'):
+        with open(manifest, 'w') as f:
+            json.dump(rows, f, indent=2)
+    else:
+        with open(manifest, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=MANIFEST_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def run_batch(name, inputs, params=None, outdir=None, workers=None, max_in_flight=None,
+              manifest=None, tiled=False, mask_aware=False, max_memory=None):
+    """
+    Apply a registered filter to every input file in parallel; returns the manifest rows
+    max_memory (bytes) is split evenly between the worker processes
+    """
+    params = dict(default_params(name), **(params or {}))
+    files = expand_inputs(inputs)
+    tiled = tiled or mask_aware or max_memory is not None
+    if tiled and FILTERS[name].get('template_outfile'):
+        # The filter names its own per-band outputs and streams by windows already
+        raise ValueError(f"{name} writes templated outputs and cannot run with --tiled, --mask-aware "
+                         f"or --max-memory; run it without them")
+    outfiles = [output_name(name, infile, params, outdir) for infile in files]
+    check_output_clashes(files, outfiles)
+    workers = workers or os.cpu_count() or 1
+    worker_memory = max_memory // workers if max_memory is not None else None
+    max_in_flight = max_in_flight or 2 * workers
+    if outdir is not None:
+        os.makedirs(outdir, exist_ok=True)
+
+    rows = []
+    start_time = time.time()
+    pending = set()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for infile, outfile in zip(files, outfiles):
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                rows.extend(future.result() for future in done)
+            pending.add(executor.submit(process_file, name, infile, params, outfile,
+                                        tiled, mask_aware, worker_memory))
+        done, _ = wait(pending)
+        rows.extend(future.result() for future in done)
+
+    # Manifest in input order, whatever order files finished in
+    order = {infile: i for i, infile in enumerate(files)}
+    rows.sort(key=lambda row: order[row['input']])
+    if manifest is not None:
+        write_manifest(rows, manifest)
+
+    succeeded = sum(row['status'] == 'SUCCESS' for row in rows)
+    elapsed = time.time() - start_time
+    print(f"{name}: {succeeded}/{len(files)} files in {elapsed:.2f} seconds with {workers} workers"
+          + (f", manifest {manifest}" if manifest else ""))
+    if max_memory is not None:
+        print(f"memory: {format_memory(worker_memory)} per worker, "
+              f"largest worker peak {format_memory(peak_rss(children=True))}")
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run one filter over many files in parallel')
+    parser.add_argument('filter', choices=sorted(FILTERS), help='filter name')
+    parser.add_argument('inputs', nargs='+', help='input files or glob patterns')
+    parser.add_argument('--param', action='append', default=[], help='filter parameter as key=value (repeatable)')
+    parser.add_argument('--outdir', type=str, default=None, help='output folder (default: next to each input)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--max-in-flight', type=int, default=None, help='files submitted at once (default: 2 x workers)')
+    parser.add_argument('--manifest', type=str, default=None, help='manifest file, .csv or .json')
+    parser.add_argument('--tiled', action='store_true', help='process each file by windows')
+    parser.add_argument('--mask-aware', action='store_true', help='honour nodata, skip empty windows (implies --tiled)')
+    parser.add_argument('--max-memory', type=parse_memory, default=None,
+                        help='peak memory limit for all workers together, e.g. 8G (implies --tiled)')
+    args = parser.parse_args()
+
+    try:
+        rows = run_batch(args.filter, args.inputs, parse_params(args.filter, args.param), args.outdir,
+                         args.workers, args.max_in_flight, args.manifest, args.tiled, args.mask_aware,
+                         args.max_memory)
+    except ValueError as e:
+        parser.error(str(e))
+    raise SystemExit(0 if all(row['status'] == 'SUCCESS' for row in rows) else 1)
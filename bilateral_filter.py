@@ -1,55 +1,170 @@
+from contextlib import ExitStack
+from functools import lru_cache
+
 import numpy as np
 import rasterio
 from scipy.ndimage import convolve
 
-def bilateral_filter(infile='Image_HW2.tif', sigma_spatial=1.5, sigma_intensity=0.1, window_size=5, outfile=None):
+from raster_tiles import band_range_stats
+
+# Steps of the range-kernel LUT over normalized differences 0..1
+RANGE_LUT_SIZE = 4096
+
+@lru_cache(maxsize=32)
+def spatial_kernel(sigma_spatial, window_size):
+    """
+    Spatial Gaussian weights of a window, built once per (sigma, size)
+    """
+    pad_size = window_size // 2
+    y, x = np.mgrid[-pad_size:pad_size+1, -pad_size:pad_size+1]
+    kernel = np.exp(-(x**2 + y**2) / (2 * sigma_spatial**2)).astype(np.float32)
+    kernel.flags.writeable = False
+    return kernel
+
+@lru_cache(maxsize=32)
+def range_lut(sigma_intensity, levels=RANGE_LUT_SIZE):
+    """
+    Range (intensity) weights tabulated over quantized normalized differences |d| in 0..1
+    """
+    diffs = np.linspace(0, 1, levels)
+    lut = np.exp(-diffs**2 / (2 * sigma_intensity**2)).astype(np.float32)
+    lut.flags.writeable = False
+    return lut
+
+def _range_index(shifted, center, levels=RANGE_LUT_SIZE):
+    # Quantized |shifted - center| as LUT index; depends on the data only, not on sigma
+    diff = np.subtract(shifted, center)
+    np.abs(diff, out=diff)
+    diff *= levels - 1
+    diff += 0.5
+    index = diff.astype(np.uint16)
+    return np.minimum(index, levels - 1, out=index)
+
+def bilateral_filter_band(band, sigma_spatial=1.5, sigma_intensity=0.1, window_size=5, stats=None):
+    sigma_s, sigma_i, size = sigma_spatial, sigma_intensity, window_size
+    if stats is None:
+        stats = band_range_stats(band)
+
+    # Normalize band to 0-1 range
+    band_min, band_max = stats['min'], stats['max']
+    if band_max == band_min:
+        return band
+    normalized = (band - band_min) / (band_max - band_min)
+
+    # Pad image
+    pad_size = size // 2
+    padded = np.pad(normalized, pad_size, mode='reflect')
+    filtered = np.zeros_like(normalized)
+
+    # Create spatial weight matrix
+    y, x = np.mgrid[-pad_size:pad_size+1, -pad_size:pad_size+1]
+    spatial_weights = np.exp(-(x**2 + y**2) / (2 * sigma_s**2))
+
+    for i in range(normalized.shape[0]):
+        for j in range(normalized.shape[1]):
+            # Get neighborhood
+            neighborhood = padded[i:i+size, j:j+size]
+            center_val = normalized[i, j]
+
+            # Calculate intensity weights
+            intensity_weights = np.exp(-((neighborhood - center_val)**2) / (2 * sigma_i**2))
+
+            # Combined weights
+            weights = spatial_weights * intensity_weights
+            weights_sum = np.sum(weights)
+
+            if weights_sum > 0:
+                filtered[i, j] = np.sum(neighborhood * weights) / weights_sum
+            else:
+                filtered[i, j] = center_val
+
+    # Scale back to original range
+    return filtered * (band_max - band_min) + band_min
+
+def bilateral_sweep_band(band, param_sets, stats=None):
+    """
+    Bilateral filter for several (sigma_spatial, sigma_intensity, window_size) at once
+    Each shift of the largest window is taken and quantized once and reused by every
+    parameter set; the weights are LUT lookups, no exp per pixel
+    """
+    if stats is None:
+        stats = band_range_stats(band)
+    band_min, band_max = stats['min'], stats['max']
+    if band_max == band_min:
+        return [band for _ in param_sets]
+    normalized = ((band - band_min) / (band_max - band_min)).astype(np.float32)
+
+    pad_size = max(size for _, _, size in param_sets) // 2
+    padded = np.pad(normalized, pad_size, mode='reflect')
+    rows, cols = normalized.shape
+    kernels = [(spatial_kernel(sigma_s, size), range_lut(sigma_i), size // 2)
+               for sigma_s, sigma_i, size in param_sets]
+    sums = [np.zeros_like(normalized) for _ in param_sets]
+    weights_sums = [np.zeros_like(normalized) for _ in param_sets]
+
+    for dy in range(-pad_size, pad_size + 1):
+        for dx in range(-pad_size, pad_size + 1):
+            shifted = padded[pad_size+dy:pad_size+dy+rows, pad_size+dx:pad_size+dx+cols]
+            index = _range_index(shifted, normalized)
+            for (spatial, lut, half), total, weights_sum in zip(kernels, sums, weights_sums):
+                if abs(dy) > half or abs(dx) > half:
+                    continue
+                weights = lut[index]
+                weights *= spatial[half+dy, half+dx]
+                weights_sum += weights
+                weights *= shifted
+                total += weights
+
+    # The center pixel always has weight 1, so weights_sum > 0; scale back to original range
+    return [total / weights_sum * (band_max - band_min) + band_min
+            for total, weights_sum in zip(sums, weights_sums)]
+
+def bilateral_filter_lut(band, sigma_spatial=1.5, sigma_intensity=0.1, window_size=5, stats=None):
+    """
+    Vectorized bilateral filter with cached spatial kernels and a range-kernel LUT
+    Matches bilateral_filter_band up to the LUT quantization of intensity differences
+    """
+    return bilateral_sweep_band(band, [(sigma_spatial, sigma_intensity, window_size)], stats)[0]
+
+def bilateral_filter_sweep(infile='Image_HW2.tif', param_sets=((1.5, 0.1, 5),), outfiles=None):
+    """
+    Bilateral filter for several parameter sets, each band read and shifted once for all of them
+    """
+    if outfiles is None:
+        outfiles = [f'Image_HW2_bilateral_ss{sigma_s}_si{sigma_i}.tif' for sigma_s, sigma_i, _ in param_sets]
+    
+    with rasterio.open(infile) as src, ExitStack() as stack:
+        profile = src.profile.copy()
+        profile.update(dtype=rasterio.float32)
+        destinations = [stack.enter_context(rasterio.open(outfile, 'w', **profile)) for outfile in outfiles]
+        
+        for b in range(1, src.count + 1):
+            print(f"Processing band {b}/{src.count}")
+            band = src.read(b, out_dtype='float32')
+            for result, dst in zip(bilateral_sweep_band(band, param_sets), destinations):
+                dst.write(result.astype(np.float32, copy=False), b)
+    
+    for outfile in outfiles:
+        print(f"Bilateral filter applied, saved as {outfile}")
+    return outfiles
+
+def bilateral_filter(infile='Image_HW2.tif', sigma_spatial=1.5, sigma_intensity=0.1, window_size=5, outfile=None,
+                     method='lut'):
     """
     Bilateral filter for edge-preserving smoothing
+    method='lut' is the vectorized LUT filter, method='reference' the per-pixel loop
     """
     if outfile is None:
         outfile = f'Image_HW2_bilateral_ss{sigma_spatial}_si{sigma_intensity}.tif'
+    if method == 'lut':
+        return bilateral_filter_sweep(infile, [(sigma_spatial, sigma_intensity, window_size)], [outfile])[0]
+    if method != 'reference':
+        raise ValueError(f"method must be 'lut' or 'reference', got {method!r}")
     
     with rasterio.open(infile) as src:
         profile = src.profile.copy()
         data = src.read().astype(np.float32)
     
-    def bilateral_filter_band(band, sigma_s, sigma_i, size):
-        # Normalize band to 0-1 range
-        band_min, band_max = band.min(), band.max()
-        if band_max == band_min:
-            return band
-        normalized = (band - band_min) / (band_max - band_min)
-        
-        # Pad image
-        pad_size = size // 2
-        padded = np.pad(normalized, pad_size, mode='reflect')
-        filtered = np.zeros_like(normalized)
-        
-        # Create spatial weight matrix
-        y, x = np.mgrid[-pad_size:pad_size+1, -pad_size:pad_size+1]
-        spatial_weights = np.exp(-(x**2 + y**2) / (2 * sigma_s**2))
-        
-        for i in range(normalized.shape[0]):
-            for j in range(normalized.shape[1]):
-                # Get neighborhood
-                neighborhood = padded[i:i+size, j:j+size]
-                center_val = normalized[i, j]
-                
-                # Calculate intensity weights
-                intensity_weights = np.exp(-((neighborhood - center_val)**2) / (2 * sigma_i**2))
-                
-                # Combined weights
-                weights = spatial_weights * intensity_weights
-                weights_sum = np.sum(weights)
-                
-                if weights_sum > 0:
-                    filtered[i, j] = np.sum(neighborhood * weights) / weights_sum
-                else:
-                    filtered[i, j] = center_val
-        
-        # Scale back to original range
-        return filtered * (band_max - band_min) + band_min
-    
     enhanced = np.empty_like(data)
     for b in range(data.shape[0]):
         print(f"Processing band {b+1}/{data.shape[0]}")
@@ -63,14 +178,13 @@ def bilateral_filter(infile='Image_HW2.tif', sigma_spatial=1.5, sigma_intensity=
     return outfile
 
 def main():
-    # Test with different parameters
+    # Test with different parameters, all from one pass over the shifted neighbourhoods
     params = [
         (1.0, 0.1, 5),
         (1.5, 0.1, 5),
         (2.0, 0.2, 5)
     ]
-    for sigma_s, sigma_i, size in params:
-        bilateral_filter(sigma_spatial=sigma_s, sigma_intensity=sigma_i, window_size=size)
+    bilateral_filter_sweep(param_sets=params)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Conformance check: fast engines against the reference implementations
+
+    python conformance_check.py                          # every engine
+    python conformance_check.py --engines bilateral tiled:canny --report conformance.csv
+
+Each engine and its reference run on synthetic rasters: a step edge with a
+diagonal line, Gaussian noise, a gradient and a constant band, stored as
+uint16 and as float32, with sizes that are not multiples of the tile size.
+Windowed filters also run with halos wider than the tile, and mask-aware:
+with a nodata value no pixel has (must equal the unmasked run) and with a
+nodata hole covering a whole tile (must come back as nodata).
+The maximum and mean absolute error, PSNR and speedup are recorded; errors
+are relative to the reference's range. Exits with status 1 if any engine is
+outside its tolerance, so faster code cannot silently change outputs.
+"""
+
+import argparse
+import csv
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+from bilateral_filter import bilateral_filter_band, bilateral_filter_lut, bilateral_sweep_band
+from filter_registry import FILTERS, default_params, kernel_params, load_kernel
+from gaussian_blur_filter import gaussian_blur_band, gaussian_blur_cube
+from highboost_unsharp import highboost_band
+from highpass_filter import highpass_band, highpass_cube
+from histogram_equalization import apply_equalization, equalize_band, streaming_equalize_stats
+from laplacian_enhancement import laplacian_enhance_band, laplacian_enhance_cube
+from pansharpening_methods import brovey_sharpen, ihs_sharpen, split_pan
+from percentiles import array_histogram, percentiles, raster_histogram
+from raster_tiles import iter_windows
+from sharpening_engine import blur_pyramid, highboost_from_blurs, highpass_from_blurs, laplacian_from_blurs
+from sobel_enhancement import sobel_enhance_band, sobel_enhance_cube
+from window_filters import compute_filter_window, filter_stats, output_band_count, read_filter_window
+
+PERCENTILES = [0, 1, 2, 5, 50, 95, 98, 99, 100]
+BILATERAL_SWEEP = [(1.0, 0.1, 5), (1.5, 0.1, 5), (2.0, 0.2, 5)]
+# Parameters whose halo reaches across neighbouring tiles (the default block is 64)
+LARGE_HALO = [('gaussian', {'sigma': 4.0}), ('gaussian', {'sigma': 20.0}), ('median', {'size': 7}),
+              ('guided', {'radius': 8}), ('canny', {'sigma': 2.5}), ('bilateral', {'window_size': 9})]
+NODATA = {'uint16': 65535, 'float32': -9999.0}
+REPORT_FIELDS = ['engine', 'raster', 'max_error', 'mean_error', 'psnr', 'reference_s', 'engine_s',
+                 'speedup', 'status']
+
+
+def synthetic_bands(rows, cols, seed=0):
+    """
+    Test patterns in 0-1: edges, noise, gradient and a constant band
+    """
+    rng = np.random.RandomState(seed)
+    y, x = np.mgrid[0:rows, 0:cols].astype(np.float64)
+    edges = np.where(x > cols / 3, 0.7, 0.2) + np.where(np.abs(x - y) < 2, 0.25, 0)
+    noise = np.clip(rng.normal(0.5, 0.15, (rows, cols)), 0, 1)
+    gradient = (x + 2 * y) / (cols + 2 * rows)
+    constant = np.full((rows, cols), 0.5)
+    return np.stack([edges, noise, gradient, constant])
+
+
+def write_synthetic(path, dtype, rows, cols, seed=0, nodata=None, hole=None):
+    """
+    Synthetic 4-band GeoTIFF: 12-bit values in uint16, or an offset float range in float32
+    With nodata, pixels of `hole` (a (rows, cols) slice pair) are set to it
+    """
+    bands = synthetic_bands(rows, cols, seed)
+    if np.dtype(dtype).kind in 'ui':
+        data = np.round(bands * 4095).astype(dtype)
+    else:
+        data = (bands * 1000 - 250).astype(dtype)
+    if hole is not None:
+        data[(slice(None),) + tuple(hole)] = nodata
+    profile = {'driver': 'GTiff', 'count': data.shape[0], 'height': rows, 'width': cols,
+               'dtype': dtype, 'transform': from_origin(0, rows, 1, 1), 'nodata': nodata}
+    with rasterio.open(path, 'w', **profile) as dst:
+        dst.write(data)
+    return path
+
+
+def per_band(function, cube):
+    return np.stack([function(band) for band in cube])
+
+
+# Reference pansharpening as first written: a Python loop over bands, cube grown by np.concatenate
+def brovey_reference(ms_bands, pan_data):
+    intensity = np.mean(ms_bands, axis=0)
+    intensity = np.where(intensity == 0, 1e-8, intensity)
+    sharpened = np.empty_like(ms_bands)
+    for i in range(ms_bands.shape[0]):
+        sharpened[i] = (ms_bands[i] / intensity) * pan_data
+    return sharpened
+
+
+def ihs_reference(ms_bands, pan_data):
+    while ms_bands.shape[0] < 3:
+        ms_bands = np.concatenate([ms_bands, ms_bands[:1]], axis=0)
+    intensity = (ms_bands[0] + ms_bands[1] + ms_bands[2]) / 3.0
+    diff = pan_data - intensity
+    sharpened = np.empty_like(ms_bands)
+    for i in range(ms_bands.shape[0]):
+        sharpened[i] = ms_bands[i] + diff
+    return sharpened
+
+
+def streamed_equalization(ctx):
+    with rasterio.open(ctx['path']) as src:
+        result = np.empty((src.count, src.height, src.width), dtype=np.float32)
+        for b in range(1, src.count + 1):
+            stats = streaming_equalize_stats(src, b, bins=256, block_size=ctx['block_size'])
+            for window in iter_windows(src.width, src.height, ctx['block_size']):
+                rows, cols = window.toslices()
+                result[b - 1, rows, cols] = apply_equalization(src.read(b, window=window), stats)
+    return result
+
+
+def streamed_percentiles(ctx):
+    with rasterio.open(ctx['path']) as src:
+        return np.stack([percentiles(raster_histogram(src, b, block_size=ctx['block_size']), PERCENTILES)
+                         for b in range(1, src.count + 1)])
+
+
+def tiled_filter(name, ctx, params=None, path=None, mask_aware=False):
+    """
+    A registered filter run window by window (whole-raster stats, halos) as tile_pipeline does
+    Empty windows of mask-aware runs are left NaN, the pipeline's nodata
+    """
+    params = dict(default_params(name), **(params or {}))
+    with rasterio.open(path or ctx['path']) as src:
+        stats = filter_stats(src, name, params, mask_aware=mask_aware)
+        result = np.full((output_band_count(src, name, params, stats=stats), src.height, src.width), np.nan,
+                         dtype=np.float32)
+        for window in iter_windows(src.width, src.height, ctx['block_size']):
+            inputs = read_filter_window(src, name, window, params, mask_aware=mask_aware)
+            filtered = compute_filter_window(name, inputs, params, stats)
+            if filtered is not None:
+                rows, cols = window.toslices()
+                result[:, rows, cols] = filtered
+    return result
+
+
+def empty_hole_filter(name, ctx):
+    """
+    Mask-aware run on the raster with a nodata hole, cropped to the hole
+    Fails unless the window covering the hole was reported empty (skipped unread)
+    """
+    params = default_params(name)
+    rows, cols = ctx['hole']
+    with rasterio.open(ctx['holed_path']) as src:
+        window = Window(cols.start, rows.start, cols.stop - cols.start, rows.stop - rows.start)
+        if not read_filter_window(src, name, window, params, mask_aware=True).get('empty'):
+            raise ValueError(f"window {window} has no valid pixel but was not reported empty")
+    return tiled_filter(name, ctx, path=ctx['holed_path'], mask_aware=True)[:, rows, cols]
+
+
+def nodata_hole(name, ctx):
+    params = default_params(name)
+    with rasterio.open(ctx['holed_path']) as src:
+        count = output_band_count(src, name, params, stats=filter_stats(src, name, params, mask_aware=True))
+    rows, cols = ctx['hole']
+    return np.full((count, rows.stop - rows.start, cols.stop - cols.start), np.nan, dtype=np.float32)
+
+
+def whole_filter(name, ctx, params=None):
+    """
+    The filter's kernel on whole bands (or the whole cube), each computing its own statistics
+    """
+    kernel, _ = load_kernel(name)
+    kwargs = kernel_params(name, dict(default_params(name), **(params or {})))
+    if FILTERS[name].get('cube'):
+        pan_data, ms_bands = split_pan(ctx['cube'])
+        return kernel(ms_bands.copy(), pan_data, **kwargs)
+    return per_band(lambda band: kernel(band, **kwargs), ctx['cube'])
+
+
+def engines():
+    """
+    name -> (reference(ctx), engine(ctx), max error as a fraction of the reference range, minimum PSNR)
+    """
+    cases = {
+        'sharpening:highpass': (
+            lambda ctx: per_band(highpass_band, ctx['cube']),
+            lambda ctx: per_band(lambda b: highpass_from_blurs(b, blur_pyramid(b, cross=False)), ctx['cube']),
+            1e-5, None),
+        'sharpening:laplacian': (
+            lambda ctx: per_band(lambda b: laplacian_enhance_band(b, 0.5), ctx['cube']),
+            lambda ctx: per_band(lambda b: laplacian_from_blurs(b, blur_pyramid(b, box=False), 0.5), ctx['cube']),
+            1e-5, None),
+        'sharpening:highboost': (
+            lambda ctx: per_band(lambda b: highboost_band(b, 1.5), ctx['cube']),
+            lambda ctx: per_band(lambda b: highboost_from_blurs(b, blur_pyramid(b, cross=False), 1.5), ctx['cube']),
+            1e-5, None),
+        'cube:laplacian': (
+            lambda ctx: per_band(lambda b: laplacian_enhance_band(b, 0.5), ctx['cube']),
+            lambda ctx: laplacian_enhance_cube(ctx['cube'], 0.5, out=np.empty_like(ctx['cube'])),
+            1e-6, None),
+        'cube:sobel': (
+            lambda ctx: per_band(lambda b: sobel_enhance_band(b, 0.5), ctx['cube']),
+            lambda ctx: sobel_enhance_cube(ctx['cube'], 0.5, out=np.empty_like(ctx['cube'])),
+            1e-6, None),
+        'cube:highpass': (
+            lambda ctx: per_band(highpass_band, ctx['cube']),
+            lambda ctx: highpass_cube(ctx['cube'], out=np.empty_like(ctx['cube'])),
+            1e-6, None),
+        'cube:gaussian': (
+            lambda ctx: per_band(lambda b: gaussian_blur_band(b, 2.0), ctx['cube']),
+            lambda ctx: gaussian_blur_cube(ctx['cube'], 2.0, out=np.empty_like(ctx['cube'])),
+            1e-6, None),
+        'bilateral:lut': (
+            lambda ctx: per_band(bilateral_filter_band, ctx['cube']),
+            lambda ctx: per_band(bilateral_filter_lut, ctx['cube']),
+            5e-3, 50.0),
+        'bilateral:sweep': (
+            lambda ctx: np.stack([per_band(lambda b: bilateral_filter_lut(b, *p), ctx['cube'])
+                                  for p in BILATERAL_SWEEP]),
+            lambda ctx: np.stack([np.stack(results) for results in
+                                  zip(*(bilateral_sweep_band(b, BILATERAL_SWEEP) for b in ctx['cube']))]),
+            1e-6, None),
+        'histeq:streaming': (
+            lambda ctx: per_band(equalize_band, ctx['cube']),
+            streamed_equalization,
+            1e-3, 60.0),
+        'percentiles:array': (
+            lambda ctx: np.stack([np.percentile(b, PERCENTILES) for b in ctx['cube']]),
+            lambda ctx: np.stack([percentiles(array_histogram(b, value_dtype=ctx['dtype']), PERCENTILES)
+                                  for b in ctx['cube']]),
+            1e-6, None),
+        'percentiles:streamed': (
+            lambda ctx: np.stack([np.percentile(b, PERCENTILES) for b in ctx['cube']]),
+            streamed_percentiles,
+            1e-6, None),
+        'pansharp:brovey': (
+            lambda ctx: brovey_reference(*split_pan(ctx['cube'].copy())[::-1]),
+            lambda ctx: brovey_sharpen(*split_pan(ctx['cube'].copy())[::-1], out=np.empty_like(ctx['cube'][1:])),
+            1e-5, None),
+        'pansharp:ihs': (
+            lambda ctx: ihs_reference(*split_pan(ctx['cube'].copy())[::-1]),
+            lambda ctx: ihs_sharpen(*split_pan(ctx['cube'].copy())[::-1], out=np.empty_like(ctx['cube'][1:])),
+            1e-5, None),
+    }
+    # Windowed execution of every registered filter against its whole-array kernel
+    for name in FILTERS:
+        tolerance = 1e-3 if name == 'histeq' else 1e-4
+        cases[f'tiled:{name}'] = (lambda ctx, n=name: whole_filter(n, ctx),
+                                  lambda ctx, n=name: tiled_filter(n, ctx),
+                                  tolerance, None)
+        # A nodata value no pixel has must not change anything; a hole must stay nodata
+        cases[f'mask:{name}:all_valid'] = (lambda ctx, n=name: tiled_filter(n, ctx),
+                                           lambda ctx, n=name: tiled_filter(n, ctx, path=ctx['masked_path'],
+                                                                            mask_aware=True),
+                                           1e-6, None)
+        cases[f'mask:{name}:empty_window'] = (lambda ctx, n=name: nodata_hole(n, ctx),
+                                              lambda ctx, n=name: empty_hole_filter(n, ctx),
+                                              0, None)
+    for name, params in LARGE_HALO:
+        label = '_'.join(f'{key}{value:g}' for key, value in params.items())
+        cases[f'tiled:{name}:{label}'] = (lambda ctx, n=name, p=params: whole_filter(n, ctx, p),
+                                          lambda ctx, n=name, p=params: tiled_filter(n, ctx, p),
+                                          1e-4, None)
+    return cases
+
+
+def compare(reference, result):
+    """
+    (max error, mean error, PSNR) of result against reference; errors are absolute
+    """
+    reference = np.asarray(reference, dtype=np.float64)
+    result = np.asarray(result, dtype=np.float64)
+    if reference.shape != result.shape:
+        raise ValueError(f"shape {result.shape} differs from reference {reference.shape}")
+    diff = np.abs(reference - result)
+    # NaN in the same place is agreement, NaN in one only is an infinite error
+    both_nan = np.isnan(reference) & np.isnan(result)
+    diff[np.isnan(diff)] = np.inf
+    diff[both_nan] = 0
+    mse = np.mean(diff ** 2)
+    finite = reference[np.isfinite(reference)]
+    value_range = (finite.max() - finite.min() if finite.size else 0) or 1.0
+    psnr = np.inf if mse == 0 else 10 * np.log10(value_range ** 2 / mse)
+    return diff.max(), diff.mean(), psnr, value_range
+
+
+def timed(function, ctx):
+    start_time = time.perf_counter()
+    result = function(ctx)
+    return result, time.perf_counter() - start_time
+
+
+def run_checks(selected=None, rows=157, cols=203, block_size=64, seed=0):
+    """
+    Run the selected engines (names or 'prefix:' groups, default all) on every synthetic raster
+    Returns report rows
+    """
+    cases = engines()
+    if selected:
+        cases = {name: case for name, case in cases.items()
+                 if any(name == s or name.startswith(s.rstrip(':') + ':') for s in selected)}
+    report = []
+    with tempfile.TemporaryDirectory() as folder:
+        for dtype in ('uint16', 'float32'):
+            path = write_synthetic(os.path.join(folder, f'synthetic_{dtype}.tif'), dtype, rows, cols, seed)
+            with rasterio.open(path) as src:
+                cube = src.read(out_dtype='float32')
+            # Same data with a nodata value it never takes, and with the first tile set to nodata
+            hole = (slice(0, min(block_size, rows)), slice(0, min(block_size, cols)))
+            masked_path = write_synthetic(os.path.join(folder, f'synthetic_{dtype}_masked.tif'), dtype, rows, cols,
+                                          seed, nodata=NODATA[dtype])
+            holed_path = write_synthetic(os.path.join(folder, f'synthetic_{dtype}_holed.tif'), dtype, rows, cols,
+                                         seed, nodata=NODATA[dtype], hole=hole)
+            ctx = {'path': path, 'cube': cube, 'dtype': dtype, 'block_size': block_size,
+                   'masked_path': masked_path, 'holed_path': holed_path, 'hole': hole}
+
+            for name, (reference, engine, max_error, min_psnr) in cases.items():
+                row = {'engine': name, 'raster': f'{dtype} {rows}x{cols}'}
+                try:
+                    expected, reference_s = timed(reference, ctx)
+                    result, engine_s = timed(engine, ctx)
+                    err_max, err_mean, psnr, value_range = compare(expected, result)
+                    passed = err_max <= max_error * value_range and (min_psnr is None or psnr >= min_psnr)
+                    row.update(max_error=err_max, mean_error=err_mean, psnr=psnr, reference_s=reference_s,
+                               engine_s=engine_s, speedup=reference_s / max(engine_s, 1e-9),
+                               status='PASS' if passed else 'FAIL')
+                except Exception as e:
+                    row.update(status=f'ERROR: {e}')
+                report.append(row)
+                print(format_row(row))
+    return report
+
+
+def format_row(row):
+    if 'psnr' not in row:
+        return f"{row['engine']:<30} {row['raster']:<18} {row['status']}"
+    return (f"{row['engine']:<30} {row['raster']:<18} max {row['max_error']:9.3g}  mean {row['mean_error']:9.3g}  "
+            f"PSNR {row['psnr']:6.1f} dB  speedup {row['speedup']:7.2f}x  {row['status']}")
+
+
+def write_report(report, path):
+    if path.endswith('.json'):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2, default=float)
+    else:
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(report)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check fast engines against reference implementations')
+    parser.add_argument('--engines', nargs='+', default=None,
+                        help="engines to run, by name or group prefix (e.g. 'tiled:' or 'bilateral')")
+    parser.add_argument('--rows', type=int, default=157, help='synthetic raster rows')
+    parser.add_argument('--cols', type=int, default=203, help='synthetic raster columns')
+    parser.add_argument('--block-size', type=int, default=64, help='tile size of windowed engines')
+    parser.add_argument('--seed', type=int, default=0, help='noise seed')
+    parser.add_argument('--report', type=str, default=None, help='report file, .csv or .json')
+    parser.add_argument('--list', action='store_true', help='list engine names and exit')
+    args = parser.parse_args()
+
+    if args.list:
+        print('\n'.join(engines()))
+        raise SystemExit(0)
+
+    start_time = time.time()
+    report = run_checks(args.engines, args.rows, args.cols, args.block_size, args.seed)
+    if args.report:
+        write_report(report, args.report)
+    failed = [row for row in report if row['status'] != 'PASS']
+    print(f"{len(report) - len(failed)}/{len(report)} checks passed in {time.time() - start_time:.2f} seconds"
+          + (f", report {args.report}" if args.report else ""))
+    raise SystemExit(1 if failed else 0)
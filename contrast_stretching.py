@@ -1,51 +1,93 @@
+from contextlib import ExitStack
+
 import numpy as np
 import rasterio
 
-def contrast_stretching(infile='Image_HW2.tif', percentile_range=(2, 98), outfile=None):
+from masking import has_mask, output_nodata
+from percentiles import array_histogram, percentiles, raster_histogram
+
+def stretch_stats_sweep(hist, percentile_ranges):
     """
-    Linear contrast stretching using percentile clipping
+    stretch_band statistics for every percentile range from one band histogram
+    """
+    qs = np.array(percentile_ranges, dtype=np.float64)
+    values = percentiles(hist, qs)
+    return [{'low': low, 'high': high, 'min': hist['min'], 'max': hist['max']} for low, high in values]
+
+def stretch_stats(band, percentile_range=(2, 98), value_dtype=None):
+    """
+    Whole-band percentiles and range that stretch_band scales with
     """
-    if outfile is None:
-        outfile = f'Image_HW2_contrast_stretch_{percentile_range[0]}_{percentile_range[1]}.tif'
+    return stretch_stats_sweep(array_histogram(band, value_dtype=value_dtype), [percentile_range])[0]
+
+def streaming_stretch_stats(src, band_index, percentile_range=(2, 98), block_size=512, masked=False):
+    """
+    stretch_stats of a raster band read block by block
+    """
+    return stretch_stats_sweep(raster_histogram(src, band_index, block_size=block_size, masked=masked),
+                               [percentile_range])[0]
+
+def stretch_band(band, percentile_range=(2, 98), stats=None):
+    # Calculate percentiles
+    if stats is None:
+        stats = stretch_stats(band, percentile_range)
+    low_val, high_val = stats['low'], stats['high']
     
-    with rasterio.open(infile) as src:
-        profile = src.profile.copy()
-        data = src.read().astype(np.float32)
+    if high_val == low_val:
+        return band
     
-    def stretch_band(band, pmin, pmax):
-        # Calculate percentiles
-        low_val = np.percentile(band, pmin)
-        high_val = np.percentile(band, pmax)
-        
-        if high_val == low_val:
-            return band
-        
-        # Linear stretch
-        stretched = (band - low_val) / (high_val - low_val)
-        
-        # Scale to original range
-        original_min, original_max = band.min(), band.max()
-        stretched = stretched * (original_max - original_min) + original_min
-        
-        # Clip to original range
-        return np.clip(stretched, original_min, original_max)
+    # Linear stretch
+    stretched = (band - low_val) / (high_val - low_val)
     
-    enhanced = np.empty_like(data)
-    for b in range(data.shape[0]):
-        enhanced[b] = stretch_band(data[b], percentile_range[0], percentile_range[1])
+    # Scale to original range
+    original_min, original_max = stats['min'], stats['max']
+    stretched = stretched * (original_max - original_min) + original_min
     
-    profile.update(dtype=rasterio.float32)
-    with rasterio.open(outfile, 'w', **profile) as dst:
-        dst.write(enhanced.astype(np.float32))
+    # Clip to original range
+    return np.clip(stretched, original_min, original_max)
+
+def contrast_stretching_sweep(infile='Image_HW2.tif', percentile_ranges=((2, 98),), outfiles=None):
+    """
+    Linear contrast stretching for several percentile ranges
+    Each band is read and histogrammed once; all ranges are answered from that histogram
+    """
+    if outfiles is None:
+        outfiles = [f'Image_HW2_contrast_stretch_{low}_{high}.tif' for low, high in percentile_ranges]
     
-    print(f"Contrast stretching applied with percentiles {percentile_range}, saved as {outfile}")
-    return outfile
+    with rasterio.open(infile) as src, ExitStack() as stack:
+        profile = src.profile.copy()
+        valid = src.dataset_mask() > 0 if has_mask(src) else None
+        nodata = output_nodata(src)
+        profile.update(dtype=rasterio.float32)
+        if valid is not None:
+            profile.update(nodata=nodata)
+        destinations = [stack.enter_context(rasterio.open(outfile, 'w', **profile)) for outfile in outfiles]
+        
+        for b in range(1, src.count + 1):
+            band = src.read(b, out_dtype='float32')
+            # Percentiles and range from valid pixels only; nodata stays nodata
+            values = band if valid is None else band[valid]
+            hist = array_histogram(values, value_dtype=src.dtypes[b - 1])
+            for prange, stats, dst in zip(percentile_ranges, stretch_stats_sweep(hist, percentile_ranges), destinations):
+                enhanced = stretch_band(band, prange, stats).astype(np.float32, copy=False)
+                if valid is not None:
+                    enhanced[~valid] = nodata
+                dst.write(enhanced, b)
+    
+    for prange, outfile in zip(percentile_ranges, outfiles):
+        print(f"Contrast stretching applied with percentiles {tuple(prange)}, saved as {outfile}")
+    return outfiles
+
+def contrast_stretching(infile='Image_HW2.tif', percentile_range=(2, 98), outfile=None):
+    """
+    Linear contrast stretching using percentile clipping
+    """
+    return contrast_stretching_sweep(infile, [percentile_range], None if outfile is None else [outfile])[0]
 
 def main():
-    # Test different percentile ranges
+    # Test different percentile ranges, all from one histogram per band
     ranges = [(1, 99), (2, 98), (5, 95)]
-    for prange in ranges:
-        contrast_stretching(percentile_range=prange)
+    contrast_stretching_sweep(percentile_ranges=ranges)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
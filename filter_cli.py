@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Single entry point for all filters
+
+    python -m filter_cli sobel tile_001.tif tile_002.tif --alpha 0.5 --outdir out/
+
+Only the module of the chosen subcommand is imported, and every input file
+is processed in the same process, so startup is paid once per batch
+"""
+
+import argparse
+import os
+import sys
+import time
+from functools import partial
+
+from filter_registry import FILTERS, call_filter, output_name
+from memory_planner import parse_memory
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m filter_cli', description='Run an image filter on one or more GeoTIFFs')
+    subparsers = parser.add_subparsers(dest='filter', metavar='FILTER')
+    subparsers.required = True
+
+    for name, spec in FILTERS.items():
+        sub = subparsers.add_parser(name, help=spec['help'], description=spec['help'])
+        sub.add_argument('inputs', nargs='+', help='input GeoTIFFs')
+        sub.add_argument('--outdir', type=str, default=None, help='output folder (default: next to each input)')
+        if not spec.get('template_outfile'):
+            sub.add_argument('--tiled', action='store_true',
+                             help='process by windows, overlapping reads, compute and writes')
+            sub.add_argument('--block-size', type=int, default=512, help='window size in pixels with --tiled')
+            sub.add_argument('--prefetch', type=int, default=4, help='windows read ahead with --tiled')
+            sub.add_argument('--mask-aware', action='store_true',
+                             help='with --tiled: skip empty windows and keep nodata out of statistics and neighbourhoods')
+            sub.add_argument('--max-memory', type=parse_memory, default=None,
+                             help='peak memory limit such as 2G (implies --tiled); tile size and workers are planned to fit')
+        for p in spec['params']:
+            sub.add_argument(f"--{p['name'].replace('_', '-')}", dest=p['name'], type=p['type'],
+                             default=p['default'], nargs=p['nargs'], help=p['help'])
+    return parser
+
+
+def run_tiled_file(args, name, infile, params, outfile):
+    """
+    call_filter's signature over tile_pipeline.run_tiled with the CLI's tiling options
+    """
+    from tile_pipeline import run_tiled
+    return run_tiled(name, infile, outfile, params, block_size=args.block_size, prefetch=args.prefetch,
+                     mask_aware=args.mask_aware, max_memory=args.max_memory)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    params = {p['name']: getattr(args, p['name']) for p in FILTERS[args.filter]['params']}
+
+    if args.outdir is not None:
+        os.makedirs(args.outdir, exist_ok=True)
+
+    tiled = getattr(args, 'tiled', False) or getattr(args, 'max_memory', None) is not None
+    run = partial(run_tiled_file, args) if tiled else call_filter
+
+    failures = 0
+    start_time = time.time()
+    for infile in args.inputs:
+        outfile = output_name(args.filter, infile, params, args.outdir)
+        file_start = time.time()
+        try:
+            run(args.filter, infile, params, outfile)
+            print(f"✓ {infile} ({time.time() - file_start:.2f}s)")
+        except Exception as e:
+            failures += 1
+            print(f"✗ {infile}: {e}")
+
+    print(f"{args.filter}: {len(args.inputs) - failures}/{len(args.inputs)} files in {time.time() - start_time:.2f} seconds")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
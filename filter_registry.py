@@ -0,0 +1,331 @@
+"""
+Registry of all filters: where each one lives, its parameters and its output naming
+
+Each filter also names its array kernel, used to run it on windows of a raster:
+kernel       - function in the module applied to one band (or to the MS cube if cube=True)
+cube_kernel  - optional function filtering all bands (bands, rows, cols) in one call,
+               used instead of looping kernel over the bands
+halo         - pixels of context a window needs, int or function of the params;
+               None means the kernel only works on whole bands
+pad_mode     - np.pad mode matching the kernel's own edge handling (default 'symmetric')
+stats        - function in the module computing whole-band statistics, passed to the
+               kernel as stats= so every window is scaled like the whole band
+raster_stats - optional stats function reading the raster block by block,
+               called as f(src, band_index, **stats_params) instead of loading whole bands
+stats_params - parameters the stats function takes
+spatial_stats - the stats function needs the 2-D band (e.g. gradients), not just its values
+kernel_params - parameters the kernel takes (default: all)
+working_set  - float32 arrays the size of the (halo-grown) window the kernel allocates
+               per band on top of its input, used to size tiles to a memory budget
+stats_working_set - the same for the stats function on whole bands (default 1)
+
+Only the standard library is imported here, so listing filters or parsing a command
+line never pays for numpy/rasterio/scipy; load_filter imports the module on demand
+"""
+
+import importlib
+import os
+
+
+def number(text):
+    """
+    Parse a CLI number as int when integral, so output names keep '2' rather than '2.0'
+    """
+    value = float(text)
+    return int(value) if value.is_integer() and '.' not in text else value
+
+
+def _param(name, type, default, help, nargs=None, scale=None):
+    """
+    scale marks pixel-length parameters for runs on decimated levels:
+    'length' divides by the decimation factor, 'window' keeps an odd window size,
+    'count' keeps an integer of at least 1
+    """
+    return {'name': name, 'type': type, 'default': default, 'help': help, 'nargs': nargs, 'scale': scale}
+
+
+# suffix is formatted with the parameters; outputs are named <input stem>_<suffix>.tif
+FILTERS = {
+    'gaussian': {
+        'module': 'gaussian_blur_filter', 'function': 'gaussian_blur_filter',
+        'help': 'Gaussian blur', 'suffix': 'gaussian_blur_sigma{sigma:.1f}',
+        'kernel': 'gaussian_blur_band', 'halo': lambda p: int(4.0 * float(p['sigma']) + 0.5),
+        'working_set': 1,
+        'cube_kernel': 'gaussian_blur_cube',
+        'params': [_param('sigma', float, 1.0, 'Gaussian sigma', scale='length')],
+    },
+    'median': {
+        'module': 'median_filter', 'function': 'median_filter_enhancement',
+        'help': 'Median filter', 'suffix': 'median_size{size}',
+        'kernel': 'median_filter_band', 'halo': lambda p: p['size'] // 2,
+        'working_set': 1,
+        'params': [_param('size', int, 3, 'window size', scale='window')],
+    },
+    'bilateral': {
+        'module': 'bilateral_filter', 'function': 'bilateral_filter',
+        'help': 'Bilateral edge-preserving smoothing', 'suffix': 'bilateral_ss{sigma_spatial}_si{sigma_intensity}',
+        'kernel': 'bilateral_filter_lut', 'halo': lambda p: p['window_size'] // 2, 'pad_mode': 'reflect',
+        'working_set': 7,
+        'stats': 'band_range_stats',
+        'params': [_param('sigma_spatial', number, 1.5, 'spatial sigma', scale='length'),
+                   _param('sigma_intensity', number, 0.1, 'intensity sigma (normalized range)'),
+                   _param('window_size', int, 5, 'window size', scale='window')],
+    },
+    'guided': {
+        'module': 'guided_filter', 'function': 'guided_filter',
+        'help': 'Self-guided edge-preserving smoothing', 'suffix': 'guided_r{radius}_eps{eps}',
+        # Two box-mean passes, each of radius `radius`
+        'kernel': 'guided_filter_band', 'halo': lambda p: 2 * p['radius'], 'stats': 'band_range_stats',
+        'working_set': 12,
+        'params': [_param('radius', int, 4, 'box radius', scale='count'),
+                   _param('eps', number, 0.01, 'regularization (normalized range)')],
+    },
+    'laplacian': {
+        'module': 'laplacian_enhancement', 'function': 'laplacian_edge_enhancement',
+        'help': 'Laplacian edge enhancement', 'suffix': 'laplacian_alpha{alpha:.1f}',
+        'kernel': 'laplacian_enhance_band', 'halo': 1,
+        'working_set': 1,
+        'cube_kernel': 'laplacian_enhance_cube',
+        'params': [_param('alpha', float, 0.5, 'enhancement weight')],
+    },
+    'sobel': {
+        'module': 'sobel_enhancement', 'function': 'sobel_edge_enhancement',
+        'help': 'Sobel edge enhancement', 'suffix': 'sobel_alpha{alpha:.1f}',
+        'kernel': 'sobel_enhance_band', 'halo': 1,
+        'working_set': 2,
+        'cube_kernel': 'sobel_enhance_cube',
+        'params': [_param('alpha', float, 0.5, 'enhancement weight')],
+    },
+    'canny': {
+        'module': 'advanced_edge_filters', 'function': 'canny_edge_enhancement',
+        'help': 'Canny edge enhancement', 'suffix': 'canny_sigma{sigma}_alpha{alpha:.1f}',
+        'kernel': 'canny_enhance_band', 'halo': lambda p: int(4.0 * float(p['sigma']) + 0.5) + 1,
+        'working_set': 8, 'stats_working_set': 5,
+        'stats': 'canny_stats', 'stats_params': ['sigma'], 'spatial_stats': True,
+        'params': [_param('sigma', number, 1.0, 'Gaussian sigma', scale='length'),
+                   _param('low_threshold', float, 0.1, 'weak edge threshold'),
+                   _param('high_threshold', float, 0.2, 'strong edge threshold'),
+                   _param('alpha', float, 0.5, 'enhancement weight')],
+    },
+    'prewitt': {
+        'module': 'advanced_edge_filters', 'function': 'prewitt_edge_enhancement',
+        'help': 'Prewitt edge enhancement', 'suffix': 'prewitt_alpha{alpha:.1f}',
+        'kernel': 'prewitt_enhance_band', 'halo': 1,
+        'working_set': 4,
+        'params': [_param('alpha', float, 0.5, 'enhancement weight')],
+    },
+    'roberts': {
+        'module': 'advanced_edge_filters', 'function': 'roberts_cross_enhancement',
+        'help': 'Roberts cross edge enhancement', 'suffix': 'roberts_alpha{alpha:.1f}',
+        'kernel': 'roberts_enhance_band', 'halo': 1,
+        'working_set': 4,
+        'params': [_param('alpha', float, 0.5, 'enhancement weight')],
+    },
+    'highpass': {
+        'module': 'highpass_filter', 'function': 'main',
+        'help': '3x3 highpass filter', 'suffix': 'highpass',
+        'kernel': 'highpass_band', 'halo': 1,
+        'working_set': 1,
+        'cube_kernel': 'highpass_cube',
+        'params': [],
+    },
+    'highboost': {
+        'module': 'highboost_unsharp', 'function': 'main',
+        'help': 'High-boost (unsharp mask) sharpening', 'suffix': 'B{band}_highboost_k{k:.2f}',
+        # main() formats the template itself for every band and k
+        'outfile_arg': 'outfile_template', 'template_outfile': True,
+        'kernel': 'highboost_band', 'halo': 1, 'kernel_params': ['k'],
+        'working_set': 3,
+        'params': [_param('k', float, [1.5], 'boost factors', nargs='+'),
+                   _param('bands', int, [1], '1-based band indexes', nargs='+')],
+    },
+    'histeq': {
+        'module': 'histogram_equalization', 'function': 'streaming_histogram_equalization',
+        'help': 'Histogram equalization (streaming, two passes)', 'suffix': 'histogram_equalized',
+        'kernel': 'equalize_band', 'halo': 0, 'kernel_params': [],
+        'working_set': 3,
+        'stats': 'equalize_stats', 'raster_stats': 'streaming_equalize_stats', 'stats_params': ['bins'],
+        'params': [_param('bins', int, 256, 'histogram bins (up to 65536 for uint16)')],
+    },
+    'clahe': {
+        'module': 'adaptive_histogram_equalization', 'function': 'adaptive_histogram_equalization',
+        'help': 'Contrast limited adaptive histogram equalization', 'suffix': 'clahe_clip{clip_limit}_tile{tile_size}',
+        'kernel': 'clahe_band', 'halo': None,
+        'working_set': 4,
+        'params': [_param('clip_limit', number, 2.0, 'clip limit'),
+                   _param('tile_size', int, 8, 'tile size', scale='count')],
+    },
+    'stretch': {
+        'module': 'contrast_stretching', 'function': 'contrast_stretching',
+        'help': 'Percentile contrast stretching', 'suffix': 'contrast_stretch_{percentile_range[0]}_{percentile_range[1]}',
+        'kernel': 'stretch_band', 'halo': 0, 'stats': 'stretch_stats', 'raster_stats': 'streaming_stretch_stats',
+        'working_set': 3,
+        'stats_params': ['percentile_range'],
+        'params': [_param('percentile_range', number, (2, 98), 'low and high percentiles', nargs=2)],
+    },
+    'gamma': {
+        'module': 'gamma_log_transforms', 'function': 'gamma_correction',
+        'help': 'Gamma correction', 'suffix': 'gamma{gamma:.1f}',
+        'kernel': 'gamma_correct_band', 'halo': 0, 'stats': 'band_range_stats',
+        'working_set': 3,
+        'params': [_param('gamma', float, 1.2, 'gamma')],
+    },
+    'log': {
+        'module': 'gamma_log_transforms', 'function': 'logarithmic_transformation',
+        'help': 'Logarithmic transformation', 'suffix': 'log_c{c:.1f}',
+        'kernel': 'log_transform_band', 'halo': 0, 'stats': 'band_range_stats',
+        'working_set': 3,
+        'params': [_param('c', float, 1.0, 'scale constant')],
+    },
+    'brovey': {
+        'module': 'pansharpening_methods', 'function': 'pansharpening_brovey',
+        'help': 'Brovey pansharpening', 'suffix': 'pansharp_brovey', 'input_arg': 'ms_file',
+        'kernel': 'brovey_sharpen', 'halo': 0, 'cube': True, 'kernel_params': [],
+        'working_set': 1,
+        'params': [_param('pan_file', str, None, 'panchromatic GeoTIFF (default: first band)')],
+    },
+    'ihs': {
+        'module': 'pansharpening_methods', 'function': 'pansharpening_ihs',
+        'help': 'IHS pansharpening', 'suffix': 'pansharp_ihs', 'input_arg': 'ms_file',
+        'kernel': 'ihs_sharpen', 'halo': 0, 'cube': True, 'kernel_params': [],
+        'working_set': 1,
+        'params': [_param('pan_file', str, None, 'panchromatic GeoTIFF (default: first band)')],
+    },
+    'pca': {
+        'module': 'pansharpening_methods', 'function': 'pansharpening_pca',
+        'help': 'PCA pansharpening', 'suffix': 'pansharp_pca', 'input_arg': 'ms_file',
+        'kernel': 'pca_sharpen', 'halo': 0, 'cube': True, 'kernel_params': [],
+        'working_set': 6, 'stats_working_set': 4,
+        'stats': 'pca_stats',
+        'params': [_param('pan_file', str, None, 'panchromatic GeoTIFF (default: first band)')],
+    },
+}
+
+
+def parse_params(name, pairs):
+    """
+    key=value strings typed by the registry; list values are comma separated
+    """
+    specs = {p['name']: p for p in FILTERS[name]['params']}
+    params = {}
+    for pair in pairs:
+        key, value = pair.split('=', 1)
+        spec = specs[key]
+        if spec['nargs']:
+            params[key] = [spec['type'](v) for v in value.split(',')]
+        else:
+            params[key] = spec['type'](value)
+    return params
+
+
+def load_filter(name):
+    """
+    Import the filter's module (and with it rasterio/scipy) and return its function
+    """
+    spec = FILTERS[name]
+    module = importlib.import_module(spec['module'])
+    return getattr(module, spec['function'])
+
+
+def load_kernel(name):
+    """
+    (kernel, stats function or None) of a filter, importing its module
+    """
+    spec = FILTERS[name]
+    module = importlib.import_module(spec['module'])
+    stats = getattr(module, spec['stats']) if spec.get('stats') else None
+    return getattr(module, spec['kernel']), stats
+
+
+def load_function(name, key):
+    """
+    Function named by spec[key] in the filter's module, or None if the filter has none
+    """
+    spec = FILTERS[name]
+    if not spec.get(key):
+        return None
+    return getattr(importlib.import_module(spec['module']), spec[key])
+
+
+def default_params(name):
+    return {p['name']: p['default'] for p in FILTERS[name]['params']}
+
+
+def kernel_params(name, params=None):
+    """
+    Defaults updated with params, restricted to what the kernel takes
+    Sweep parameters (nargs='+') take a single value per kernel call
+    """
+    spec = FILTERS[name]
+    merged = default_params(name)
+    merged.update(params or {})
+    names = spec.get('kernel_params', [p['name'] for p in spec['params']])
+    sweeps = {p['name'] for p in spec['params'] if p['nargs'] == '+'}
+    result = {}
+    for key in names:
+        value = merged[key]
+        if key in sweeps and isinstance(value, (list, tuple)):
+            if len(value) != 1:
+                raise ValueError(f"{name}: kernel takes a single {key}, got {value}")
+            value = value[0]
+        result[key] = value
+    return result
+
+
+def scale_params(name, params, factor):
+    """
+    Parameters for running the filter on the raster decimated by `factor`,
+    so kernels cover the same ground distance as at full resolution
+    """
+    scaled = dict(params)
+    for p in FILTERS[name]['params']:
+        value = scaled.get(p['name'])
+        if p['scale'] is None or value is None or factor == 1:
+            continue
+        if p['scale'] == 'length':
+            scaled[p['name']] = value / factor
+        elif p['scale'] == 'window':
+            size = max(1, int(round(value / factor)))
+            scaled[p['name']] = size if size % 2 == 1 else size + 1
+        elif p['scale'] == 'count':
+            scaled[p['name']] = max(1, int(round(value / factor)))
+    return scaled
+
+
+def stats_params(name, params):
+    return {key: params[key] for key in FILTERS[name].get('stats_params', [])}
+
+
+def filter_halo(name, params):
+    """
+    Pixels of context a window needs for this filter, None if only whole bands work
+    """
+    halo = FILTERS[name].get('halo', 0)
+    return halo(params) if callable(halo) else halo
+
+
+def output_name(name, infile, params, outdir=None):
+    """
+    <input stem>_<filter suffix>.tif next to the input, or in outdir
+    For template filters the band/k fields are left for the filter to fill in
+    """
+    spec = FILTERS[name]
+    stem = os.path.splitext(os.path.basename(infile))[0]
+    if spec.get('template_outfile'):
+        suffix = spec['suffix']
+    else:
+        suffix = spec['suffix'].format(**params)
+    folder = outdir if outdir is not None else os.path.dirname(infile)
+    return os.path.join(folder, f'{stem}_{suffix}.tif')
+
+
+def call_filter(name, infile, params, outfile):
+    """
+    Run a filter on one input with the keyword names its function expects
+    """
+    spec = FILTERS[name]
+    function = load_filter(name)
+    kwargs = dict(params)
+    kwargs[spec.get('input_arg', 'infile')] = infile
+    kwargs[spec.get('outfile_arg', 'outfile')] = outfile
+    return function(**kwargs)
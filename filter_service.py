@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Long-running filter worker with a local HTTP API
+
+    python filter_service.py --port 8765
+    python filter_service.py --socket /tmp/filters.sock
+
+GET  /health   open dataset count
+GET  /filters  registered filter names
+POST /window   {"filter", "infile", "window": [col_off, row_off, width, height],
+                "params": {...}, "bands": [...]} -> float32 (bands, rows, cols) as .npy
+POST /run      {"filter", "infile", "params": {...}, "outfile" or "outdir"} -> {"outfile", "seconds"}
+
+Datasets stay open between requests (least recently used closed first), and the
+whole-band statistics of filters like gamma or stretch are computed once per dataset.
+Filters that cannot work on windows (CLAHE) are run on the whole band once per
+dataset; later windows with the same parameters are cut from that result, which
+is kept for the latest parameters only.
+"""
+
+import argparse
+import io
+import json
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+from filter_registry import FILTERS, call_filter, default_params, filter_halo, output_name, stats_params
+from window_filters import compute_filter_window, filter_stats, read_filter_window
+
+
+class DatasetPool:
+    """
+    Open rasterio datasets shared between requests, closed least recently used first
+    Entries in use are never closed; reads on one dataset are serialized by its lock
+    """
+
+    def __init__(self, max_open=32):
+        self.max_open = max_open
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @contextmanager
+    def dataset(self, path):
+        path = os.path.abspath(path)
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry['mtime'] != mtime and entry['users'] == 0:
+                # File was rewritten: drop the handle and its cached statistics and results
+                self._close(path)
+                entry = None
+            if entry is None:
+                entry = {'dataset': rasterio.open(path), 'path': path, 'mtime': mtime, 'users': 0,
+                         'lock': threading.Lock(), 'stats': {}, 'whole': None}
+                self._entries[path] = entry
+            self._entries.move_to_end(path)
+            entry['users'] += 1
+            self._evict()
+        try:
+            yield entry
+        finally:
+            with self._lock:
+                entry['users'] -= 1
+                self._evict()
+
+    def close(self):
+        with self._lock:
+            for path in list(self._entries):
+                self._close(path)
+
+    def _evict(self):
+        for path in list(self._entries):
+            if len(self._entries) <= self.max_open:
+                break
+            if self._entries[path]['users'] == 0:
+                self._close(path)
+
+    def _close(self, path):
+        self._entries.pop(path)['dataset'].close()
+
+
+@contextmanager
+def _locked(*entries):
+    """
+    Hold the read locks of several pooled datasets, always taken in path order
+    """
+    unique = {entry['path']: entry for entry in entries if entry is not None}
+    with ExitStack() as stack:
+        for path in sorted(unique):
+            stack.enter_context(unique[path]['lock'])
+        yield
+
+
+def _cached_stats(entry, name, params, bands, pan_entry=None):
+    if not FILTERS[name].get('stats'):
+        return None
+    pan_src = pan_entry['dataset'] if pan_entry is not None else None
+    key = (name, json.dumps(stats_params(name, params), sort_keys=True),
+           pan_entry['path'] if pan_entry is not None else None)
+
+    with _locked(entry, pan_entry):
+        cached = entry['stats'].setdefault(key, {})
+        if FILTERS[name].get('cube'):
+            if 0 not in cached:
+                cached.update(filter_stats(entry['dataset'], name, params, pan_src=pan_src))
+        else:
+            missing = [b for b in bands if b not in cached]
+            if missing:
+                cached.update(filter_stats(entry['dataset'], name, params, missing))
+        return cached
+
+
+def _whole_band_window(entry, name, window, params, bands, stats):
+    """
+    Window of a whole-band filter, cut from the filtered bands kept in the pool entry
+    Only the latest filter and parameters are kept, so a parameter sweep holds one scene at a time
+    """
+    src = entry['dataset']
+    key = (name, json.dumps(params, sort_keys=True))
+    with _locked(entry):
+        if entry['whole'] is None or entry['whole'][0] != key:
+            entry['whole'] = (key, {})
+        cached = entry['whole'][1]
+        missing = [b for b in bands if b not in cached]
+        if missing:
+            full = Window(0, 0, src.width, src.height)
+            inputs = read_filter_window(src, name, full, params, missing)
+            cached.update(zip(missing, compute_filter_window(name, inputs, params, stats)))
+    row_off, col_off = int(window.row_off), int(window.col_off)
+    rows, cols = int(window.height), int(window.width)
+    return np.stack([cached[b][row_off:row_off + rows, col_off:col_off + cols] for b in bands])
+
+
+def filter_window(pool, name, infile, window, params=None, bands=None):
+    """
+    Filter one window of infile using pooled datasets and cached statistics
+    """
+    params = dict(default_params(name), **(params or {}))
+    pan_file = params.get('pan_file') if FILTERS[name].get('cube') else None
+
+    with ExitStack() as stack:
+        entry = stack.enter_context(pool.dataset(infile))
+        pan_entry = stack.enter_context(pool.dataset(pan_file)) if pan_file else None
+        src = entry['dataset']
+        pan_src = pan_entry['dataset'] if pan_entry is not None else None
+        bands = list(bands or range(1, src.count + 1))
+
+        stats = _cached_stats(entry, name, params, bands, pan_entry)
+        if filter_halo(name, params) is None and not FILTERS[name].get('cube'):
+            return _whole_band_window(entry, name, window, params, bands, stats)
+        with _locked(entry, pan_entry):
+            inputs = read_filter_window(src, name, window, params, bands, pan_src)
+
+    return compute_filter_window(name, inputs, params, stats)
+
+
+class FilterRequestHandler(BaseHTTPRequestHandler):
+    pool = None
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok', 'open_datasets': len(self.pool)})
+        elif self.path == '/filters':
+            self._send_json(200, {'filters': sorted(FILTERS)})
+        else:
+            self._send_json(404, {'error': f'unknown path {self.path}'})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if request.get('filter') not in FILTERS:
+                raise ValueError(f"unknown filter {request.get('filter')!r}")
+
+            start_time = time.perf_counter()
+            if self.path == '/window':
+                result = filter_window(self.pool, request['filter'], request['infile'],
+                                       Window(*request['window']), request.get('params'), request.get('bands'))
+                buffer = io.BytesIO()
+                np.save(buffer, result)
+                elapsed_ms = (time.perf_counter() - start_time) * 1000
+                self._send(200, buffer.getvalue(), 'application/octet-stream', {'X-Elapsed-Ms': f'{elapsed_ms:.2f}'})
+            elif self.path == '/run':
+                params = dict(default_params(request['filter']), **request.get('params', {}))
+                outfile = request.get('outfile') or output_name(request['filter'], request['infile'],
+                                                                params, request.get('outdir'))
+                call_filter(request['filter'], request['infile'], params, outfile)
+                self._send_json(200, {'outfile': outfile, 'seconds': time.perf_counter() - start_time})
+            else:
+                self._send_json(404, {'error': f'unknown path {self.path}'})
+        except Exception as e:
+            self._send_json(400, {'error': str(e)})
+
+    def address_string(self):
+        # Unix socket clients have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload).encode(), 'application/json')
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        UnixStreamServer.server_bind(self)
+        self.server_name, self.server_port = 'localhost', 0
+
+
+def make_server(host='127.0.0.1', port=8765, socket_path=None, max_open=32):
+    """
+    HTTP server on localhost, or on a Unix socket if socket_path is given
+    """
+    handler = type('PooledFilterRequestHandler', (FilterRequestHandler,), {'pool': DatasetPool(max_open)})
+    if socket_path is not None:
+        return ThreadingUnixHTTPServer(socket_path, handler)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+class UnixHTTPConnection(HTTPConnection):
+    def __init__(self, socket_path, timeout=60):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def _connect(address):
+    if isinstance(address, str):
+        return UnixHTTPConnection(address)
+    return HTTPConnection(*address, timeout=60)
+
+
+def _post(address, path, payload):
+    connection = _connect(address)
+    try:
+        connection.request('POST', path, json.dumps(payload), {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        body = response.read()
+        if response.status != 200:
+            raise RuntimeError(json.loads(body).get('error', body))
+        return body
+    finally:
+        connection.close()
+
+
+def request_window(address, name, infile, window, params=None, bands=None):
+    """
+    Client side of POST /window; address is (host, port) or a Unix socket path
+    """
+    params = dict(params or {})
+    if params.get('pan_file'):
+        params['pan_file'] = os.path.abspath(params['pan_file'])
+    payload = {'filter': name, 'infile': os.path.abspath(infile), 'window': list(window),
+               'params': params, 'bands': bands}
+    return np.load(io.BytesIO(_post(address, '/window', payload)))
+
+
+def request_run(address, name, infile, params=None, outfile=None):
+    """
+    Client side of POST /run
+    """
+    payload = {'filter': name, 'infile': os.path.abspath(infile), 'params': params or {}, 'outfile': outfile}
+    return json.loads(_post(address, '/run', payload))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Filter worker service')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='bind address')
+    parser.add_argument('--port', type=int, default=8765, help='TCP port')
+    parser.add_argument('--socket', type=str, default=None, help='serve on this Unix socket instead of TCP')
+    parser.add_argument('--max-open', type=int, default=32, help='datasets kept open')
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.socket, args.max_open)
+    print(f"Filter service listening on {args.socket or f'{args.host}:{args.port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.RequestHandlerClass.pool.close()
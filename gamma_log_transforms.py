@@ -1,6 +1,46 @@
 import numpy as np
 import rasterio
 
+from raster_tiles import band_range_stats
+
+def gamma_correct_band(band, gamma=1.2, stats=None):
+    if stats is None:
+        stats = band_range_stats(band)
+    
+    # Normalize to 0-1 range
+    band_min, band_max = stats['min'], stats['max']
+    if band_max == band_min:
+        return band
+    
+    normalized = (band - band_min) / (band_max - band_min)
+    
+    # Apply gamma correction
+    corrected = np.power(normalized, gamma)
+    
+    # Scale back to original range
+    return corrected * (band_max - band_min) + band_min
+
+def log_transform_band(band, c=1.0, stats=None):
+    if stats is None:
+        stats = band_range_stats(band)
+    band_min, band_max = stats['min'], stats['max']
+    
+    # Ensure positive values
+    band_shifted = band - band_min + 1
+    
+    # Apply log transformation
+    log_transformed = c * np.log(1 + band_shifted)
+    
+    # Normalize to original range; the log is monotonic so its range follows the band range
+    log_min = c * np.log(1 + (band_min - band_min + 1))
+    log_max = c * np.log(1 + (band_max - band_min + 1))
+    if log_min > log_max:
+        log_min, log_max = log_max, log_min
+    if log_max != log_min:
+        normalized = (log_transformed - log_min) / (log_max - log_min)
+        return normalized * (band_max - band_min) + band_min
+    return band
+
 def gamma_correction(infile='Image_HW2.tif', gamma=1.2, outfile=None):
     """
     Gamma correction for brightness and contrast adjustment
@@ -12,20 +52,6 @@ def gamma_correction(infile='Image_HW2.tif', gamma=1.2, outfile=None):
         profile = src.profile.copy()
         data = src.read().astype(np.float32)
     
-    def gamma_correct_band(band, gamma_val):
-        # Normalize to 0-1 range
-        band_min, band_max = band.min(), band.max()
-        if band_max == band_min:
-            return band
-        
-        normalized = (band - band_min) / (band_max - band_min)
-        
-        # Apply gamma correction
-        corrected = np.power(normalized, gamma_val)
-        
-        # Scale back to original range
-        return corrected * (band_max - band_min) + band_min
-    
     enhanced = np.empty_like(data)
     for b in range(data.shape[0]):
         enhanced[b] = gamma_correct_band(data[b], gamma)
@@ -48,20 +74,6 @@ def logarithmic_transformation(infile='Image_HW2.tif', c=1.0, outfile=None):
         profile = src.profile.copy()
         data = src.read().astype(np.float32)
     
-    def log_transform_band(band, c_val):
-        # Ensure positive values
-        band_shifted = band - band.min() + 1
-        
-        # Apply log transformation
-        log_transformed = c_val * np.log(1 + band_shifted)
-        
-        # Normalize to original range
-        log_min, log_max = log_transformed.min(), log_transformed.max()
-        if log_max != log_min:
-            normalized = (log_transformed - log_min) / (log_max - log_min)
-            return normalized * (band.max() - band.min()) + band.min()
-        return band
-    
     enhanced = np.empty_like(data)
     for b in range(data.shape[0]):
         enhanced[b] = log_transform_band(data[b], c)
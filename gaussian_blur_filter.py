@@ -2,6 +2,15 @@ import numpy as np
 import rasterio
 from scipy.ndimage import gaussian_filter
 
+def gaussian_blur_band(band, sigma=1.0):
+    return gaussian_filter(band, sigma=sigma, mode='reflect')
+
+def gaussian_blur_cube(data, sigma=1.0, out=None, band_axis=0):
+    # sigma 0 along the band axis: one call blurs every band independently
+    sigmas = [sigma] * data.ndim
+    sigmas[band_axis] = 0
+    return gaussian_filter(data, sigma=sigmas, output=out, mode='reflect')
+
 def gaussian_blur_filter(infile='Image_HW2.tif', sigma=1.0, outfile=None):
     """
     Gaussian blur filter for noise reduction and smoothing
@@ -11,17 +20,16 @@ def gaussian_blur_filter(infile='Image_HW2.tif', sigma=1.0, outfile=None):
     
     with rasterio.open(infile) as src:
         profile = src.profile.copy()
-        data = src.read().astype(np.float32)
+        data = src.read(out_dtype='float32')
     
-    # Apply Gaussian blur to each band
+    # Apply Gaussian blur to all bands at once
     filtered = np.empty_like(data)
-    for b in range(data.shape[0]):
-        filtered[b] = gaussian_filter(data[b], sigma=sigma, mode='reflect')
+    gaussian_blur_cube(data, sigma, out=filtered)
     
     # Maintain original data type
     profile.update(dtype=rasterio.float32)
     with rasterio.open(outfile, 'w', **profile) as dst:
-        dst.write(filtered.astype(np.float32))
+        dst.write(filtered)
     
     print(f"Gaussian blur filter applied with sigma={sigma}, saved as {outfile}")
     return outfile
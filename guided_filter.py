@@ -0,0 +1,106 @@
+import numpy as np
+import rasterio
+from scipy.ndimage import uniform_filter
+
+from raster_tiles import band_range_stats
+
+def box_mean(band, radius):
+    # Running-sum box filter: cost per pixel does not depend on radius
+    return uniform_filter(band, size=2 * radius + 1, mode='reflect')
+
+def normalize_band(band, stats=None):
+    if stats is None:
+        stats = band_range_stats(band)
+    band_min, band_max = stats['min'], stats['max']
+    if band_max == band_min:
+        return None
+    return (band - band_min) / (band_max - band_min)
+
+def guided_filter_band(band, radius=4, eps=0.01, guide=None, stats=None, guide_stats=None):
+    """
+    Guided filter (He et al.) built from box means only
+    guide=None smooths the band guided by itself; otherwise guide is e.g. the pan band
+    eps is in normalized (0-1) units, like sigma_intensity**2 of the bilateral filter
+    """
+    if stats is None:
+        stats = band_range_stats(band)
+    p = normalize_band(band, stats)
+    if p is None:
+        return band
+    if guide is None:
+        guide_norm = p
+    else:
+        guide_norm = normalize_band(guide, guide_stats)
+        if guide_norm is None:
+            return band
+
+    mean_I = box_mean(guide_norm, radius)
+    mean_p = mean_I if guide is None else box_mean(p, radius)
+    corr_II = box_mean(guide_norm * guide_norm, radius)
+    corr_Ip = corr_II if guide is None else box_mean(guide_norm * p, radius)
+
+    var_I = corr_II - mean_I * mean_I
+    cov_Ip = corr_Ip - mean_I * mean_p
+
+    # Local linear model p ~ a * I + b
+    a = cov_Ip / (var_I + eps)
+    b = mean_p - a * mean_I
+
+    filtered = box_mean(a, radius) * guide_norm + box_mean(b, radius)
+
+    # Scale back to original range
+    band_min, band_max = stats['min'], stats['max']
+    return filtered * (band_max - band_min) + band_min
+
+def guided_filter(infile='Image_HW2.tif', radius=4, eps=0.01, guide='self', pan_file=None, outfile=None):
+    """
+    Guided filter for edge-preserving smoothing, O(1) per pixel for any radius
+    guide='self' smooths every band guided by itself; guide='pan' guides every band
+    by the pan band (pan_file, or the first band when pan_file is None)
+    """
+    if outfile is None:
+        prefix = 'guided' if guide == 'self' else 'guided_pan'
+        outfile = f'Image_HW2_{prefix}_r{radius}_eps{eps}.tif'
+
+    with rasterio.open(infile) as src:
+        profile = src.profile.copy()
+        data = src.read().astype(np.float32)
+
+    pan_data, pan_stats = None, None
+    if guide == 'pan':
+        if pan_file is None:
+            pan_data = data[0]
+        else:
+            with rasterio.open(pan_file) as pan_src:
+                pan_data = pan_src.read(1).astype(np.float32)
+        pan_stats = band_range_stats(pan_data)
+    elif guide != 'self':
+        raise ValueError(f"guide must be 'self' or 'pan', got {guide!r}")
+
+    enhanced = np.empty_like(data)
+    for b in range(data.shape[0]):
+        print(f"Processing band {b+1}/{data.shape[0]}")
+        enhanced[b] = guided_filter_band(data[b], radius, eps, guide=pan_data, guide_stats=pan_stats)
+
+    profile.update(dtype=rasterio.float32)
+    with rasterio.open(outfile, 'w', **profile) as dst:
+        dst.write(enhanced.astype(np.float32))
+
+    print(f"Guided filter applied, saved as {outfile}")
+    return outfile
+
+def main():
+    # Test different radii; cost does not grow with the radius
+    params = [
+        (2, 0.01),
+        (4, 0.01),
+        (8, 0.04)
+    ]
+    for radius, eps in params:
+        guided_filter(radius=radius, eps=eps)
+
+    # Pan-guided smoothing of the MS bands
+    guided_filter(radius=4, eps=0.01, guide='pan')
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -1,47 +1,87 @@
 import argparse
 import numpy as np
 import rasterio
+from contextlib import ExitStack
 from scipy.ndimage import uniform_filter
 
+from raster_tiles import iter_windows, read_with_halo, crop_halo, dtype_range
 
-def highboost_band(band, k=1.5):
+# uniform_filter(size=3) needs one pixel of context around each window
+HALO = 1
+
+
+def unsharp_mask(band):
     blurred = uniform_filter(band, size=3, mode='reflect')
-    mask = band - blurred
-    return band + k * mask
+    return band - blurred
+
 
+def highboost_band(band, k=1.5):
+    return band + k * unsharp_mask(band)
 
-def main(infile='Image_HW2.tif', k=1.5):
-    with rasterio.open(infile) as src:
-        profile = src.profile.copy()
-        band1 = src.read(1).astype(np.float32)
-        orig_dtype = src.dtypes[0]
 
-    boosted = highboost_band(band1, k=k)
+def main(infile='Image_HW2.tif', k=1.5, bands=(1,), outfile_template=None, block_size=512):
+    """
+    High-boost filtering streamed by windows
+    The unsharp mask is computed once per band and window, and every k in `k` is written from it
+    outfile_template is formatted with band and k
+    """
+    ks = list(dict.fromkeys(k)) if np.iterable(k) else [k]
+    bands = list(dict.fromkeys(bands))
+    if outfile_template is None:
+        outfile_template = 'Image_HW2_B{band}_highboost_k{k:.2f}.tif'
 
-    try:
-        npdtype = np.dtype(orig_dtype)
-        if np.issubdtype(npdtype, np.integer):
-            info = np.iinfo(npdtype)
-            min_val, max_val = info.min, info.max
-        else:
-            info = np.finfo(npdtype)
-            min_val, max_val = info.min, info.max
-    except Exception:
-        min_val, max_val = 0, 65535
+    # Every (band, k) needs a file of its own: a shared path would mix their windows
+    outfiles, writers = {}, {}
+    for b in bands:
+        for kv in ks:
+            outfile = outfile_template.format(band=b, k=float(kv))
+            if outfile in writers:
+                other_b, other_k = writers[outfile]
+                raise ValueError(f"band {b}, k={kv} and band {other_b}, k={other_k} both write {outfile}; "
+                                 f"put {{band}} and {{k}} in the output template")
+            outfiles[(b, kv)] = outfile
+            writers[outfile] = (b, kv)
 
-    boosted_clipped = np.clip(boosted, min_val, max_val).astype(npdtype)
+    with rasterio.open(infile) as src, ExitStack() as stack:
+        destinations = {}
+        for b in bands:
+            orig_dtype = src.dtypes[b - 1]
+            profile = src.profile.copy()
+            profile.update(count=1, dtype=orig_dtype)
+            for kv in ks:
+                outfile = outfiles[(b, kv)]
+                destinations[(b, kv)] = (outfile, stack.enter_context(rasterio.open(outfile, 'w', **profile)))
 
-    outfile = f"Image_HW2_B1_highboost_k{float(k):.2f}.tif"
+        for window in iter_windows(src.width, src.height, block_size):
+            for b in bands:
+                npdtype = np.dtype(src.dtypes[b - 1])
+                min_val, max_val = dtype_range(npdtype)
 
-    profile.update(count=1, dtype=orig_dtype)
+                padded = read_with_halo(src, b, window, HALO)
+                band = crop_halo(padded, HALO)
+                mask = crop_halo(unsharp_mask(padded), HALO)
 
-    with rasterio.open(outfile, 'w', **profile) as dst:
-        dst.write(boosted_clipped, 1)
+                for kv in ks:
+                    boosted = band + kv * mask
+                    boosted_clipped = np.clip(boosted, min_val, max_val).astype(npdtype)
+                    destinations[(b, kv)][1].write(boosted_clipped, 1, window=window)
+
+    for outfile, _ in destinations.values():
+        print(f"High-boost filter applied, saved as {outfile}")
+    return [outfile for outfile, _ in destinations.values()]
 
 
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description='High-boost filtering on B1 (NIR)')
-    parser.add_argument('--k', type=float, default=1.5, help='boost factor (k > 1)')
+    parser = argparse.ArgumentParser(description='High-boost filtering (default B1, NIR)')
+    parser.add_argument('--k', type=float, nargs='+', default=[1.5], help='boost factors (k > 1), all written from one unsharp mask')
+    parser.add_argument('--bands', type=int, nargs='+', default=[1], help='1-based band indexes')
     parser.add_argument('--infile', type=str, default='Image_HW2.tif', help='input GeoTIFF')
+    parser.add_argument('--outfile-template', type=str, default=None,
+                        help='output name formatted with {band} and {k}, e.g. out_B{band}_k{k:.2f}.tif')
+    parser.add_argument('--block-size', type=int, default=512, help='window size in pixels for streaming')
     args = parser.parse_args()
-    main(infile=args.infile, k=args.k)
+    try:
+        main(infile=args.infile, k=args.k, bands=args.bands,
+             outfile_template=args.outfile_template, block_size=args.block_size)
+    except ValueError as e:
+        parser.error(str(e))
@@ -2,26 +2,30 @@ import numpy as np
 import rasterio
 from scipy.ndimage import convolve
 
+HIGHPASS_KERNEL = np.array([
+    [-1, -1, -1],
+    [-1,  8, -1],
+    [-1, -1, -1]
+], dtype=np.float32) / 9.0
+
+def highpass_band(band):
+    return convolve(band, HIGHPASS_KERNEL, mode='reflect')
+
+def highpass_cube(data, out=None, band_axis=0):
+    # One convolve call for all bands; band_axis=-1 for (rows, cols, bands) arrays
+    return convolve(data, np.expand_dims(HIGHPASS_KERNEL, band_axis), output=out, mode='reflect')
+
 def main(infile='Image_HW2.tif', outfile='Image_HW2_highpass.tif'):
     with rasterio.open(infile) as src:
         profile = src.profile.copy()
-        data = src.read().astype(np.float32)
-
-    kernel = np.array([
-        [-1, -1, -1],
-        [-1,  8, -1],
-        [-1, -1, -1]
-    ], dtype=np.float32) / 9.0
+        data = src.read(out_dtype='float32')
 
     filtered = np.empty_like(data, dtype=np.float32)
-
-    for b in range(data.shape[0]):
-        band = data[b]
-        filtered[b] = convolve(band, kernel, mode='reflect')
+    highpass_cube(data, out=filtered)
 
     profile.update(dtype=rasterio.float32)
     with rasterio.open(outfile, 'w', **profile) as dst:
-        dst.write(filtered.astype(np.float32))
+        dst.write(filtered)
 
 
 if __name__ == '__main__':
@@ -1,39 +1,151 @@
 import numpy as np
 import rasterio
 
+from raster_tiles import iter_windows
+
+def equalize_stats(band, bins=256):
+    """
+    Whole-band range and normalized CDF that equalize_band maps values through
+    """
+    band_min, band_max = band.min(), band.max()
+    if band_max == band_min:
+        return {'min': band_min, 'max': band_max, 'cdf': None}
+    
+    normalized = (band - band_min) / (band_max - band_min)
+    
+    # Calculate histogram
+    hist, _ = np.histogram(normalized.flatten(), bins=bins, range=[0, 1])
+    
+    # Calculate cumulative distribution function (CDF)
+    cdf = hist.cumsum()
+    return {'min': band_min, 'max': band_max, 'cdf': cdf / cdf[-1]}
+
+def equalize_band(band, stats=None):
+    if stats is None:
+        stats = equalize_stats(band)
+    
+    # Normalize to 0-1 range
+    band_min, band_max = stats['min'], stats['max']
+    if band_max == band_min:
+        return band
+    
+    normalized = (band - band_min) / (band_max - band_min)
+    bins = np.linspace(0, 1, len(stats['cdf']) + 1)
+    
+    # Interpolate to get equalized values
+    equalized = np.interp(normalized.flatten(), bins[:-1], stats['cdf'])
+    equalized = equalized.reshape(band.shape)
+    
+    # Scale back to original range
+    return equalized * (band_max - band_min) + band_min
+
+def streaming_equalize_stats(src, band_index, bins=256, block_size=512, masked=False):
+    """
+    Pass one of the streaming equalizer: range and CDF of a band, accumulated block by block
+    8/16-bit integer bands are counted exactly per value and also get a value -> output LUT
+    masked=True counts only pixels valid in the dataset mask
+    """
+    def read_block(window, **kwargs):
+        block = src.read(band_index, window=window, **kwargs)
+        return block[src.dataset_mask(window=window) > 0] if masked else block
+
+    dtype = np.dtype(src.dtypes[band_index - 1])
+    windows = list(iter_windows(src.width, src.height, block_size))
+    edges = np.linspace(0, 1, bins + 1)
+
+    if dtype.kind in 'ui' and dtype.itemsize <= 2:
+        offset = int(np.iinfo(dtype).min)
+        counts = np.zeros(2 ** (8 * dtype.itemsize), dtype=np.int64)
+        for window in windows:
+            block = read_block(window)
+            if offset:
+                block = block.astype(np.int32) - offset
+            counts += np.bincount(block.ravel(), minlength=counts.size)
+
+        present = np.flatnonzero(counts)
+        if present.size == 0:
+            # No valid pixel at all
+            return {'min': np.float32(0), 'max': np.float32(0), 'cdf': None}
+        band_min = np.float32(present[0] + offset)
+        band_max = np.float32(present[-1] + offset)
+        if band_max == band_min:
+            return {'min': band_min, 'max': band_max, 'cdf': None}
+
+        # Same float32 normalization as equalize_band, once per distinct value
+        values = np.arange(present[0] + offset, present[-1] + offset + 1).astype(np.float32)
+        normalized = (values - band_min) / (band_max - band_min)
+        hist, _ = np.histogram(normalized, bins=bins, range=[0, 1], weights=counts[present[0]:present[-1] + 1])
+        cdf = hist.cumsum()
+        cdf = cdf / cdf[-1]
+        lut = np.interp(normalized, edges[:-1], cdf) * (band_max - band_min) + band_min
+        return {'min': band_min, 'max': band_max, 'cdf': cdf, 'lut': lut.astype(np.float32)}
+
+    band_min, band_max = np.inf, -np.inf
+    for window in windows:
+        block = read_block(window, out_dtype='float32')
+        if block.size == 0:
+            continue
+        band_min = min(band_min, block.min())
+        band_max = max(band_max, block.max())
+    if band_min > band_max:
+        return {'min': np.float32(0), 'max': np.float32(0), 'cdf': None}
+    band_min, band_max = np.float32(band_min), np.float32(band_max)
+    if band_max == band_min:
+        return {'min': band_min, 'max': band_max, 'cdf': None}
+
+    hist = np.zeros(bins, dtype=np.int64)
+    for window in windows:
+        block = read_block(window, out_dtype='float32')
+        block -= band_min
+        block /= band_max - band_min
+        hist += np.histogram(block, bins=bins, range=[0, 1])[0]
+    cdf = hist.cumsum()
+    return {'min': band_min, 'max': band_max, 'cdf': cdf / cdf[-1]}
+
+def apply_equalization(block, stats):
+    """
+    Pass two of the streaming equalizer: map one block through the band's CDF
+    """
+    if stats['max'] == stats['min']:
+        return block.astype(np.float32)
+    if 'lut' in stats:
+        return stats['lut'][block.astype(np.intp) - int(stats['min'])]
+    return equalize_band(block.astype(np.float32), stats).astype(np.float32)
+
+def streaming_histogram_equalization(infile='Image_HW2.tif', bins=256, block_size=512, outfile=None):
+    """
+    Histogram equalization in two streaming passes, memory independent of the scene size
+    bins can go up to 65536 (one bin per value of uint16 data)
+    """
+    if outfile is None:
+        outfile = 'Image_HW2_histogram_equalized.tif'
+
+    with rasterio.open(infile) as src:
+        profile = src.profile.copy()
+        stats = {b: streaming_equalize_stats(src, b, bins, block_size) for b in range(1, src.count + 1)}
+
+        profile.update(dtype=rasterio.float32)
+        with rasterio.open(outfile, 'w', **profile) as dst:
+            for window in iter_windows(src.width, src.height, block_size):
+                for b in range(1, src.count + 1):
+                    lut = 'lut' in stats[b]
+                    block = src.read(b, window=window) if lut else src.read(b, window=window, out_dtype='float32')
+                    dst.write(apply_equalization(block, stats[b]), b, window=window)
+
+    print(f"Streaming histogram equalization applied with {bins} bins, saved as {outfile}")
+    return outfile
+
 def histogram_equalization(infile='Image_HW2.tif', outfile=None):
     """
     Histogram equalization for contrast enhancement
     """
     if outfile is None:
-        outfile = f'Image_HW2_histogram_equalized.tif'
+        outfile = 'Image_HW2_histogram_equalized.tif'
     
     with rasterio.open(infile) as src:
         profile = src.profile.copy()
         data = src.read().astype(np.float32)
     
-    def equalize_band(band):
-        # Normalize to 0-1 range
-        band_min, band_max = band.min(), band.max()
-        if band_max == band_min:
-            return band
-        
-        normalized = (band - band_min) / (band_max - band_min)
-        
-        # Calculate histogram
-        hist, bins = np.histogram(normalized.flatten(), bins=256, range=[0, 1])
-        
-        # Calculate cumulative distribution function (CDF)
-        cdf = hist.cumsum()
-        cdf_normalized = cdf / cdf[-1]
-        
-        # Interpolate to get equalized values
-        equalized = np.interp(normalized.flatten(), bins[:-1], cdf_normalized)
-        equalized = equalized.reshape(band.shape)
-        
-        # Scale back to original range
-        return equalized * (band_max - band_min) + band_min
-    
     enhanced = np.empty_like(data)
     for b in range(data.shape[0]):
         enhanced[b] = equalize_band(data[b])
@@ -46,7 +158,7 @@ def histogram_equalization(infile='Image_HW2.tif', outfile=None):
     return outfile
 
 def main():
-    histogram_equalization()
+    streaming_histogram_equalization()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
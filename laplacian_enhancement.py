@@ -2,6 +2,28 @@ import numpy as np
 import rasterio
 from scipy.ndimage import convolve
 
+# Standard Laplacian kernel
+LAPLACIAN_KERNEL = np.array([
+    [0, -1, 0],
+    [-1, 4, -1],
+    [0, -1, 0]
+], dtype=np.float32)
+
+def laplacian_enhance_band(band, alpha=0.5):
+    laplacian = convolve(band, LAPLACIAN_KERNEL, mode='reflect')
+    return band + alpha * laplacian
+
+def laplacian_enhance_cube(data, alpha=0.5, out=None, band_axis=0):
+    """
+    All bands in one convolve call: the 2-D kernel gets a length-1 band axis
+    band_axis=-1 for band-interleaved-by-pixel arrays (rows, cols, bands)
+    """
+    kernel = np.expand_dims(LAPLACIAN_KERNEL, band_axis)
+    out = convolve(data, kernel, output=out, mode='reflect')
+    out *= alpha
+    out += data
+    return out
+
 def laplacian_edge_enhancement(infile='Image_HW2.tif', alpha=0.5, outfile=None):
     """
     Laplacian edge enhancement filter
@@ -12,23 +34,14 @@ def laplacian_edge_enhancement(infile='Image_HW2.tif', alpha=0.5, outfile=None):
     
     with rasterio.open(infile) as src:
         profile = src.profile.copy()
-        data = src.read().astype(np.float32)
-    
-    # Standard Laplacian kernel
-    laplacian_kernel = np.array([
-        [0, -1, 0],
-        [-1, 4, -1],
-        [0, -1, 0]
-    ], dtype=np.float32)
+        data = src.read(out_dtype='float32')
     
     enhanced = np.empty_like(data)
-    for b in range(data.shape[0]):
-        laplacian = convolve(data[b], laplacian_kernel, mode='reflect')
-        enhanced[b] = data[b] + alpha * laplacian
+    laplacian_enhance_cube(data, alpha, out=enhanced)
     
     profile.update(dtype=rasterio.float32)
     with rasterio.open(outfile, 'w', **profile) as dst:
-        dst.write(enhanced.astype(np.float32))
+        dst.write(enhanced)
     
     print(f"Laplacian enhancement applied with alpha={alpha}, saved as {outfile}")
     return outfile
@@ -0,0 +1,59 @@
+"""
+Nodata and mask handling for windowed filtering
+
+Valid pixels come from the dataset mask (nodata value, mask band or alpha).
+Windows with no valid pixel are skipped, statistics use valid pixels only,
+and invalid pixels are filled from their valid neighbours by normalized
+convolution before a kernel sees them, so fill values never enter
+neighbourhood sums.
+"""
+
+import numpy as np
+from rasterio.enums import MaskFlags
+from scipy.ndimage import uniform_filter
+
+from raster_tiles import grow_window, pad_grown
+
+
+def has_mask(src):
+    """
+    True unless every band is flagged all-valid (no nodata, mask band or alpha)
+    """
+    return any(MaskFlags.all_valid not in flags for flags in src.mask_flag_enums)
+
+
+def read_valid_with_halo(src, window, halo, mode='symmetric'):
+    """
+    Boolean valid-pixel mask of a window grown by `halo`, mirrored like read_with_halo
+    """
+    grown, pad = grow_window(src, window, halo)
+    return pad_grown(src.dataset_mask(window=grown) > 0, pad, mode)
+
+
+def fill_invalid(band, valid, radius=1):
+    """
+    Replace invalid pixels by the mean of the valid pixels within `radius` (normalized convolution)
+    Pixels with no valid neighbour get the mean of all valid pixels
+    """
+    if valid.all():
+        return band
+    size = 2 * max(radius, 1) + 1
+    weights = uniform_filter(valid.astype(np.float32), size=size, mode='reflect')
+    sums = uniform_filter(np.where(valid, band, 0).astype(np.float32), size=size, mode='reflect')
+
+    filled = band.astype(np.float32, copy=True)
+    has_neighbours = ~valid & (weights > 1e-6)
+    filled[has_neighbours] = sums[has_neighbours] / weights[has_neighbours]
+    isolated = ~valid & ~has_neighbours
+    if isolated.any():
+        filled[isolated] = band[valid].mean() if valid.any() else 0
+    return filled
+
+
+def output_nodata(src):
+    """
+    Nodata value for a float32 output: always NaN
+    The input's own value (e.g. 0 for uint16) is a legitimate filtered value: highpass and
+    Laplacian results are exactly 0.0 on flat valid areas and would read as nodata
+    """
+    return np.nan
@@ -2,6 +2,9 @@ import numpy as np
 import rasterio
 from scipy.ndimage import median_filter
 
+def median_filter_band(band, size=3):
+    return median_filter(band, size=size, mode='reflect')
+
 def median_filter_enhancement(infile='Image_HW2.tif', size=3, outfile=None):
     """
     Median filter for noise reduction while preserving edges
@@ -16,7 +19,7 @@ def median_filter_enhancement(infile='Image_HW2.tif', size=3, outfile=None):
     # Apply median filter to each band
     filtered = np.empty_like(data)
     for b in range(data.shape[0]):
-        filtered[b] = median_filter(data[b], size=size, mode='reflect')
+        filtered[b] = median_filter_band(data[b], size)
     
     profile.update(dtype=rasterio.float32)
     with rasterio.open(outfile, 'w', **profile) as dst:
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Pick tile size and parallelism for a tiled run that fits a memory budget
+
+    python memory_planner.py sobel Image_HW2.tif --max-memory 2G
+
+The prediction counts float32 window arrays: every compute worker holds its
+input window (grown by the halo), the kernel's working set (the registry's
+working_set multiplier, per band) and its result; the read-ahead and write
+queues hold prefetch inputs and pending_writes results. Whole-band statistics,
+computed before the pipeline starts, are a separate peak (stats_working_set).
+GDAL's block cache defaults to 5% of physical RAM, more than a whole budget on
+a large node, so planned runs set it (GDAL_CACHEMAX, see gdal_env) to a size
+taken out of the budget.
+The baseline is the process's current RSS when planning starts (interpreter,
+numpy, GDAL), so each file of a multi-file run is planned on its own.
+"""
+
+import argparse
+import os
+import resource
+import sys
+import threading
+from contextlib import contextmanager
+
+from filter_registry import FILTERS, default_params, filter_halo, parse_params
+
+DEFAULT_WORKING_SET = 3
+BLOCK_SIZES = (2048, 1024, 512, 256, 128, 64)
+FLOAT32 = 4
+MIN_GDAL_CACHE = 8 << 20
+MAX_GDAL_CACHE = 64 << 20
+UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+
+def parse_memory(text):
+    """
+    Bytes from a size such as '4G', '512M', '1.5GB' or a plain byte count
+    """
+    text = str(text).strip().upper().rstrip('B').rstrip('I')
+    unit = text[-1] if text and text[-1] in UNITS else ''
+    return int(float(text[:len(text) - len(unit)]) * UNITS[unit])
+
+
+def format_memory(size):
+    return f"{size / (1 << 20):.0f} MiB"
+
+
+def peak_rss(children=False):
+    """
+    Peak resident set size in bytes of this process (or of its largest finished child)
+    On Linux this is VmHWM, which reset_peak_rss can bring down to the current RSS
+    """
+    if not children:
+        try:
+            with open('/proc/self/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+
+def current_rss():
+    """
+    Resident set size in bytes right now (the lifetime peak where /proc is unavailable)
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return peak_rss()
+
+
+def reset_peak_rss():
+    """
+    Reset the kernel's peak RSS (VmHWM) to the current RSS; False where that is not supported
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+@contextmanager
+def measure_peak(interval=0.05):
+    """
+    Peak RSS in bytes of the enclosed run, as measured['peak'] once the block exits
+    The kernel's high-water mark is reset on entry; where it cannot be, RSS is sampled every `interval` seconds
+    """
+    measured = {'peak': current_rss()}
+    if reset_peak_rss():
+        try:
+            yield measured
+        finally:
+            measured['peak'] = peak_rss()
+        return
+
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(interval):
+            measured['peak'] = max(measured['peak'], current_rss())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        yield measured
+    finally:
+        stop.set()
+        sampler.join()
+        measured['peak'] = max(measured['peak'], current_rss())
+
+
+def gdal_cache_size(max_memory):
+    """
+    GDAL block cache for a run limited to max_memory bytes: an eighth of it, within 8-64 MiB
+    """
+    if max_memory is None:
+        return MAX_GDAL_CACHE
+    return int(min(max(max_memory // 8, MIN_GDAL_CACHE), MAX_GDAL_CACHE))
+
+
+def gdal_env(plan):
+    """
+    rasterio.Env holding GDAL's block cache to the planned size; run the planned work inside it
+    """
+    import rasterio
+    # GDAL reads values below 100000 as megabytes
+    return rasterio.Env(GDAL_CACHEMAX=max(1, plan['gdal_cache'] >> 20))
+
+
+def raster_shape(infile):
+    """
+    (bands, rows, cols) of a raster, read from its header
+    """
+    import rasterio
+    with rasterio.open(infile) as src:
+        return src.count, src.height, src.width
+
+
+def predict_bytes(name, params, shape, block_size, workers, prefetch=4, pending_writes=4, gdal_cache=0):
+    """
+    Predicted peak bytes above the baseline of a tiled run, GDAL's block cache (gdal_cache bytes) included
+    """
+    spec = FILTERS[name]
+    bands, rows, cols = shape
+    halo = filter_halo(name, params)
+    if halo is None:
+        # Whole-band filters run as one window
+        grown = block = rows * cols
+        workers = 1
+    else:
+        side = min(block_size, max(rows, cols))
+        grown = (min(side, rows) + 2 * halo) * (min(side, cols) + 2 * halo)
+        block = min(side, rows) * min(side, cols)
+
+    window_in = bands * grown * FLOAT32
+    window_out = bands * block * FLOAT32
+    # Per-band kernels allocate their working set one band at a time
+    kernel_bands = bands if spec.get('cube') or spec.get('cube_kernel') else 1
+    kernel = spec.get('working_set', DEFAULT_WORKING_SET) * kernel_bands * grown * FLOAT32
+    pipeline = workers * (window_in + kernel + window_out) + (prefetch + 1) * window_in + pending_writes * window_out
+
+    stats = 0
+    if spec.get('stats') and not spec.get('raster_stats'):
+        # filter_stats reads whole bands (the whole cube for cube filters)
+        band = rows * cols * FLOAT32
+        stats = (1 + spec.get('stats_working_set', 1)) * band * (bands if spec.get('cube') else 1)
+    return max(pipeline, stats) + gdal_cache
+
+
+def plan_tiled(name, infile, params=None, max_memory=None, workers=None, prefetch=4, pending_writes=4):
+    """
+    Tile size and worker count for run_tiled within max_memory bytes (peak RSS)
+    The run must be made inside gdal_env(plan), which caps GDAL's block cache at plan['gdal_cache']
+    Prefers every CPU busy on the largest tile; otherwise the fitting plan with
+    the most pixels in flight. Raises MemoryError if even one small tile does not fit.
+    """
+    params = dict(default_params(name), **(params or {}))
+    shape = raster_shape(infile)
+    max_workers = workers or os.cpu_count() or 1
+    baseline = current_rss()
+    gdal_cache = gdal_cache_size(max_memory)
+    budget = max_memory - baseline if max_memory is not None else float('inf')
+
+    def fit(block_size):
+        # Most workers, then the longest queues, that fit at this tile size
+        for n in range(max_workers, 0, -1):
+            for queued in sorted({prefetch, pending_writes, 1}, reverse=True):
+                plan = {'block_size': block_size, 'workers': n,
+                        'prefetch': min(prefetch, queued), 'pending_writes': min(pending_writes, queued)}
+                predicted = predict_bytes(name, params, shape, gdal_cache=gdal_cache, **plan)
+                if predicted <= budget:
+                    return dict(plan, predicted=baseline + predicted, baseline=baseline, gdal_cache=gdal_cache)
+        return None
+
+    best = None
+    for block_size in BLOCK_SIZES:
+        plan = fit(block_size)
+        if plan is None:
+            continue
+        if plan['workers'] == max_workers:
+            return plan
+        if best is None or plan['workers'] * block_size ** 2 > best['workers'] * best['block_size'] ** 2:
+            best = plan
+    if best is None:
+        smallest = predict_bytes(name, params, shape, BLOCK_SIZES[-1], 1, 1, 1, gdal_cache)
+        raise MemoryError(f"{name} on {infile} needs about {format_memory(baseline + smallest)}, "
+                          f"over the {format_memory(max_memory)} limit")
+    return best
+
+
+def report(plan, observed):
+    """
+    One line comparing the planned peak RSS with the one observed during the run (measure_peak)
+    """
+    return (f"memory plan: {plan['block_size']}px tiles, {plan['workers']} workers, "
+            f"GDAL cache {format_memory(plan['gdal_cache'])}, "
+            f"predicted peak {format_memory(plan['predicted'])}, observed {format_memory(observed)}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Plan a tiled filter run for a memory budget')
+    parser.add_argument('filter', choices=sorted(FILTERS), help='filter name')
+    parser.add_argument('infile', type=str, help='input GeoTIFF')
+    parser.add_argument('--param', action='append', default=[], help='filter parameter as key=value (repeatable)')
+    parser.add_argument('--max-memory', type=parse_memory, required=True, help='peak RSS limit, e.g. 2G or 512M')
+    parser.add_argument('--workers', type=int, default=None, help='most compute workers to use (default: CPU count)')
+    args = parser.parse_args()
+
+    plan = plan_tiled(args.filter, args.infile, parse_params(args.filter, args.param), args.max_memory, args.workers)
+    for key in ('block_size', 'workers', 'prefetch', 'pending_writes'):
+        print(f"{key}: {plan[key]}")
+    print(f"GDAL_CACHEMAX: {format_memory(plan['gdal_cache'])}")
+    print(f"predicted peak: {format_memory(plan['predicted'])} (baseline {format_memory(plan['baseline'])})")
@@ -2,117 +2,78 @@ import numpy as np
 import rasterio
 from scipy.ndimage import gaussian_filter
 
-def pansharpening_brovey(ms_file='Image_HW2.tif', pan_file=None, outfile=None):
+def split_pan(ms_data, pan_data=None):
     """
-    Brovey pansharpening method
-    If pan_file is None, uses the first band as panchromatic
+    Return (pan, MS bands); without a separate pan the first band is used as panchromatic
     """
-    if outfile is None:
-        outfile = 'Image_HW2_pansharp_brovey.tif'
-    
-    with rasterio.open(ms_file) as src:
-        profile = src.profile.copy()
-        ms_data = src.read().astype(np.float32)
-    
-    if pan_file is None:
+    if pan_data is None:
         # Use first band as panchromatic (highest resolution assumed)
         pan_data = ms_data[0]
         ms_bands = ms_data[1:] if ms_data.shape[0] > 1 else ms_data
     else:
-        with rasterio.open(pan_file) as pan_src:
-            pan_data = pan_src.read(1).astype(np.float32)
         ms_bands = ms_data
-    
-    # Calculate intensity (mean of all MS bands)
-    intensity = np.mean(ms_bands, axis=0)
-    
-    # Avoid division by zero
-    intensity = np.where(intensity == 0, 1e-8, intensity)
-    
-    # Apply Brovey transform
-    sharpened = np.empty_like(ms_bands)
-    for i in range(ms_bands.shape[0]):
-        sharpened[i] = (ms_bands[i] / intensity) * pan_data
-    
-    profile.update(count=sharpened.shape[0], dtype=rasterio.float32)
-    with rasterio.open(outfile, 'w', **profile) as dst:
-        dst.write(sharpened.astype(np.float32))
-    
-    print(f"Brovey pansharpening applied, saved as {outfile}")
-    return outfile
+    return pan_data, ms_bands
 
-def pansharpening_ihs(ms_file='Image_HW2.tif', pan_file=None, outfile=None):
-    """
-    IHS (Intensity-Hue-Saturation) pansharpening method
-    """
-    if outfile is None:
-        outfile = 'Image_HW2_pansharp_ihs.tif'
-    
+def read_pan_ms(ms_file, pan_file=None):
     with rasterio.open(ms_file) as src:
         profile = src.profile.copy()
-        ms_data = src.read().astype(np.float32)
+        ms_data = src.read(out_dtype='float32')
     
-    if pan_file is None:
-        # Use first band as panchromatic
-        pan_data = ms_data[0]
-        ms_bands = ms_data[1:] if ms_data.shape[0] > 1 else ms_data
-    else:
+    pan_data = None
+    if pan_file is not None:
         with rasterio.open(pan_file) as pan_src:
-            pan_data = pan_src.read(1).astype(np.float32)
-        ms_bands = ms_data
-    
-    # Ensure we have at least 3 bands for RGB
-    if ms_bands.shape[0] < 3:
-        # Duplicate bands to make RGB
-        while ms_bands.shape[0] < 3:
-            ms_bands = np.concatenate([ms_bands, ms_bands[:1]], axis=0)
-    
-    # Take first 3 bands as RGB
-    r, g, b = ms_bands[0], ms_bands[1], ms_bands[2]
+            pan_data = pan_src.read(1, out_dtype='float32')
     
-    # RGB to IHS transformation
-    intensity = (r + g + b) / 3.0
-    
-    # Replace intensity with panchromatic
-    new_intensity = pan_data
-    
-    # Calculate the difference
-    diff = new_intensity - intensity
-    
-    # Add the difference to each band
-    sharpened = np.empty_like(ms_bands)
-    for i in range(ms_bands.shape[0]):
-        sharpened[i] = ms_bands[i] + diff
-    
-    profile.update(count=sharpened.shape[0], dtype=rasterio.float32)
-    with rasterio.open(outfile, 'w', **profile) as dst:
-        dst.write(sharpened.astype(np.float32))
-    
-    print(f"IHS pansharpening applied, saved as {outfile}")
-    return outfile
+    pan_data, ms_bands = split_pan(ms_data, pan_data)
+    return profile, pan_data, ms_bands
 
-def pansharpening_pca(ms_file='Image_HW2.tif', pan_file=None, outfile=None):
+def brovey_sharpen(ms_bands, pan_data, out=None):
     """
-    PCA (Principal Component Analysis) pansharpening method
+    Brovey transform: every band times pan / intensity, in one broadcast multiply
+    out=ms_bands sharpens in place, so only one band-sized temporary is allocated
     """
-    if outfile is None:
-        outfile = 'Image_HW2_pansharp_pca.tif'
+    # Calculate intensity (mean of all MS bands)
+    ratio = np.mean(ms_bands, axis=0)
     
-    with rasterio.open(ms_file) as src:
-        profile = src.profile.copy()
-        ms_data = src.read().astype(np.float32)
+    # Avoid division by zero
+    ratio[ratio == 0] = 1e-8
     
-    if pan_file is None:
-        # Use first band as panchromatic
-        pan_data = ms_data[0]
-        ms_bands = ms_data[1:] if ms_data.shape[0] > 1 else ms_data
+    # pan / intensity once, applied to all bands
+    np.divide(pan_data, ratio, out=ratio)
+    return np.multiply(ms_bands, ratio, out=out)
+
+def ihs_sharpen(ms_bands, pan_data, out=None, generalized=False):
+    """
+    IHS fusion: add (pan - intensity) to every band in one broadcast add
+    The intensity is the mean of the first 3 bands (fewer bands are padded by repeating
+    the first one, giving 3 output bands); generalized=True uses the mean of all N bands (GIHS)
+    out=ms_bands sharpens in place when there are at least 3 bands
+    """
+    count = ms_bands.shape[0]
+    if generalized:
+        intensity = np.mean(ms_bands, axis=0)
     else:
-        with rasterio.open(pan_file) as pan_src:
-            pan_data = pan_src.read(1).astype(np.float32)
-        ms_bands = ms_data
-    
-    # Reshape for PCA
-    rows, cols = ms_bands.shape[1], ms_bands.shape[2]
+        # RGB to IHS transformation
+        r, g, b = (ms_bands[i if i < count else 0] for i in range(3))
+        intensity = r + g
+        intensity += b
+        intensity /= 3.0
+    
+    # Replace intensity with panchromatic: the difference, once for all bands
+    diff = np.subtract(pan_data, intensity, out=intensity)
+    
+    bands = count if generalized else max(count, 3)
+    if out is None or out.shape[0] != bands:
+        out = np.empty((bands,) + ms_bands.shape[1:], dtype=np.result_type(ms_bands, diff))
+    np.add(ms_bands, diff, out=out[:count])
+    for i in range(count, bands):
+        np.add(ms_bands[0], diff, out=out[i])
+    return out
+
+def pca_stats(ms_bands):
+    """
+    Principal components of the whole MS cube, so windows share one transform
+    """
     reshaped = ms_bands.reshape(ms_bands.shape[0], -1).T
     
     # Calculate covariance matrix
@@ -123,7 +84,15 @@ def pansharpening_pca(ms_file='Image_HW2.tif', pan_file=None, outfile=None):
     
     # Sort by eigenvalues (descending)
     idx = np.argsort(eigenvals)[::-1]
-    eigenvecs = eigenvecs[:, idx]
+    return {'eigenvecs': eigenvecs[:, idx]}
+
+def pca_sharpen(ms_bands, pan_data, stats=None):
+    if stats is None:
+        stats = pca_stats(ms_bands)
+    eigenvecs = stats['eigenvecs']
+    
+    # Reshape for PCA
+    reshaped = ms_bands.reshape(ms_bands.shape[0], -1).T
     
     # Transform to PC space
     pc_data = np.dot(reshaped, eigenvecs)
@@ -133,7 +102,54 @@ def pansharpening_pca(ms_file='Image_HW2.tif', pan_file=None, outfile=None):
     
     # Transform back
     sharpened_flat = np.dot(pc_data, eigenvecs.T)
-    sharpened = sharpened_flat.T.reshape(ms_bands.shape)
+    return sharpened_flat.T.reshape(ms_bands.shape)
+
+def pansharpening_brovey(ms_file='Image_HW2.tif', pan_file=None, outfile=None):
+    """
+    Brovey pansharpening method
+    If pan_file is None, uses the first band as panchromatic
+    """
+    if outfile is None:
+        outfile = 'Image_HW2_pansharp_brovey.tif'
+    
+    profile, pan_data, ms_bands = read_pan_ms(ms_file, pan_file)
+    # In place: the float32 MS cube read is the only full-size array
+    sharpened = brovey_sharpen(ms_bands, pan_data, out=ms_bands)
+    
+    profile.update(count=sharpened.shape[0], dtype=rasterio.float32)
+    with rasterio.open(outfile, 'w', **profile) as dst:
+        dst.write(sharpened)
+    
+    print(f"Brovey pansharpening applied, saved as {outfile}")
+    return outfile
+
+def pansharpening_ihs(ms_file='Image_HW2.tif', pan_file=None, outfile=None, generalized=False):
+    """
+    IHS (Intensity-Hue-Saturation) pansharpening method
+    generalized=True takes the intensity from all MS bands instead of the first three
+    """
+    if outfile is None:
+        outfile = 'Image_HW2_pansharp_gihs.tif' if generalized else 'Image_HW2_pansharp_ihs.tif'
+    
+    profile, pan_data, ms_bands = read_pan_ms(ms_file, pan_file)
+    sharpened = ihs_sharpen(ms_bands, pan_data, out=ms_bands, generalized=generalized)
+    
+    profile.update(count=sharpened.shape[0], dtype=rasterio.float32)
+    with rasterio.open(outfile, 'w', **profile) as dst:
+        dst.write(sharpened)
+    
+    print(f"IHS pansharpening applied, saved as {outfile}")
+    return outfile
+
+def pansharpening_pca(ms_file='Image_HW2.tif', pan_file=None, outfile=None):
+    """
+    PCA (Principal Component Analysis) pansharpening method
+    """
+    if outfile is None:
+        outfile = 'Image_HW2_pansharp_pca.tif'
+    
+    profile, pan_data, ms_bands = read_pan_ms(ms_file, pan_file)
+    sharpened = pca_sharpen(ms_bands, pan_data)
     
     profile.update(count=sharpened.shape[0], dtype=rasterio.float32)
     with rasterio.open(outfile, 'w', **profile) as dst:
@@ -146,6 +162,7 @@ def main():
     # Apply different pansharpening methods
     pansharpening_brovey()
     pansharpening_ihs()
+    pansharpening_ihs(generalized=True)
     pansharpening_pca()
 
 if __name__ == '__main__':
@@ -0,0 +1,214 @@
+"""
+Percentiles of large bands from one histogram instead of sorting
+
+np.percentile partitions the whole band on every call. Here a histogram of the
+band answers any number of percentile queries: exactly for 8/16-bit integer
+bands (one count per value), and for float bands by refining only the few bins
+holding the requested ranks: a bin small enough is gathered and sorted, a larger
+one (e.g. a spike of near-equal values) gets its own finer histogram on the next
+pass, so memory stays bounded by GATHER_LIMIT pixels per requested rank. Results
+follow np.percentile's default linear interpolation; float NaN and +-inf are skipped.
+"""
+
+import numpy as np
+
+from raster_tiles import iter_windows
+
+CHUNK_SIZE = 1 << 22
+# Float refinement: sub-bins per split cell, and the most pixels gathered for sorting per cell
+SUB_BINS = 4096
+GATHER_LIMIT = 1 << 18
+
+
+def _exact_dtype(dtype):
+    dtype = np.dtype(dtype)
+    return dtype.kind in 'ui' and dtype.itemsize <= 2
+
+
+def _histogram(blocks, dtype, bins):
+    """
+    Histogram of the values yielded by blocks() (called once per pass)
+    8/16-bit integer dtypes get one count per value; others a range pass and then
+    `bins` bins over [min, max] of the finite values. NaN and +-inf are left out of
+    the counts and n, like np.nanpercentile leaves out NaN
+    """
+    dtype = np.dtype(dtype)
+    if _exact_dtype(dtype):
+        # float32 reads of 8/16-bit data hold the integers exactly
+        base = int(np.iinfo(dtype).min)
+        counts = np.zeros(1 << (8 * dtype.itemsize), dtype=np.int64)
+        for block in blocks():
+            counts += np.bincount(block.astype(np.int32).ravel() - base, minlength=counts.size)
+        present = np.flatnonzero(counts)
+        n = int(counts.sum())
+        if n == 0:
+            return {'n': 0, 'min': np.nan, 'max': np.nan}
+        counts = counts[present[0]:present[-1] + 1]
+        offset = int(present[0]) + base
+        return {'n': n, 'exact': True, 'counts': counts, 'offset': offset,
+                'min': np.float32(offset), 'max': np.float32(offset + counts.size - 1)}
+
+    raw_blocks = blocks
+
+    def blocks():
+        for block in raw_blocks():
+            block = block.ravel()
+            finite = np.isfinite(block)
+            yield block if finite.all() else block[finite]
+
+    band_min, band_max, n = np.inf, -np.inf, 0
+    for block in blocks():
+        if block.size:
+            band_min = min(band_min, block.min())
+            band_max = max(band_max, block.max())
+            n += block.size
+    if n == 0:
+        return {'n': 0, 'min': np.nan, 'max': np.nan}
+    hist = {'n': n, 'exact': False, 'blocks': blocks, 'min': band_min, 'max': band_max,
+            'scale': bins / (float(band_max) - float(band_min)) if band_max > band_min else 0.0}
+    hist['counts'] = np.zeros(bins, dtype=np.int64)
+    for block in blocks():
+        hist['counts'] += np.bincount(_bin_index(block, hist), minlength=bins)
+    return hist
+
+
+def _bin_index(block, hist):
+    # Monotonic in the value, so every value of bin i is <= every value of bin i + 1
+    index = ((block.ravel() - float(hist['min'])) * hist['scale']).astype(np.intp)
+    return np.minimum(index, hist['counts'].size - 1, out=index)
+
+
+def array_histogram(band, bins=16384, value_dtype=None):
+    """
+    Percentile histogram of an in-memory array
+    value_dtype is the dtype the values came from (e.g. the raster's), so float32
+    reads of 8/16-bit bands still get the exact per-value histogram
+    """
+    def blocks():
+        flat = band.reshape(-1)
+        for start in range(0, flat.size, CHUNK_SIZE):
+            yield flat[start:start + CHUNK_SIZE]
+
+    return _histogram(blocks, value_dtype or band.dtype, bins)
+
+
+def raster_histogram(src, band_index, bins=16384, block_size=512, masked=False):
+    """
+    Percentile histogram of a raster band read block by block
+    masked=True counts only pixels valid in the dataset mask
+    """
+    windows = list(iter_windows(src.width, src.height, block_size))
+
+    def blocks():
+        for window in windows:
+            block = src.read(band_index, window=window, out_dtype='float32')
+            yield block[src.dataset_mask(window=window) > 0] if masked else block
+
+    return _histogram(blocks, src.dtypes[band_index - 1], bins)
+
+
+def _sub_index(values, low, scale):
+    # Sub-bin of each value within a cell starting at `low`, same monotonic rule as _bin_index
+    return np.clip((values - low) * scale, 0, SUB_BINS - 1).astype(np.intp)
+
+
+def _cell_values(values, cell):
+    for low, scale, sub_bin in cell['path']:
+        values = values[_sub_index(values, low, scale) == sub_bin]
+    return values
+
+
+def _order_statistics(hist, ranks):
+    """
+    Values of rank `ranks` (0-based, ascending) of the histogrammed data
+    """
+    cum = hist['counts'].cumsum()
+    bin_of_rank = np.searchsorted(cum, ranks, side='right')
+    if hist['exact']:
+        return (bin_of_rank + hist['offset']).astype(np.float64)
+    if hist['scale'] == 0:
+        return np.full(len(ranks), float(hist['min']))
+
+    # A cell is a value interval holding some requested ranks: a coarse bin, narrowed
+    # by a path of sub-bins. Small cells are gathered and sorted; larger ones get a
+    # SUB_BINS histogram and are split into the sub-bins holding their ranks.
+    values_out = np.empty(len(ranks), dtype=np.float64)
+    cells = []
+    for coarse in np.unique(bin_of_rank):
+        holds = np.flatnonzero(bin_of_rank == coarse)
+        start = cum[coarse] - hist['counts'][coarse]
+        cells.append({'coarse': coarse, 'path': [], 'low': float(hist['min']) + coarse / hist['scale'],
+                      'width': 1 / hist['scale'], 'count': int(hist['counts'][coarse]),
+                      'ranks': [(i, int(ranks[i] - start)) for i in holds]})
+
+    while cells:
+        keep = np.zeros(hist['counts'].size, dtype=bool)
+        keep[[cell['coarse'] for cell in cells]] = True
+        for cell in cells:
+            cell['gather'] = cell['count'] <= GATHER_LIMIT
+            cell['parts'] = []
+            cell['fine'] = np.zeros(SUB_BINS, dtype=np.int64)
+            cell['vmin'], cell['vmax'] = np.inf, -np.inf
+
+        for block in hist['blocks']():
+            values = block.ravel()
+            coarse = _bin_index(values, hist)
+            selected = keep[coarse]
+            values, coarse = values[selected], coarse[selected]
+            for cell in cells:
+                inside = _cell_values(values[coarse == cell['coarse']], cell)
+                if not inside.size:
+                    continue
+                if cell['gather']:
+                    cell['parts'].append(inside)
+                else:
+                    cell['fine'] += np.bincount(_sub_index(inside, cell['low'], SUB_BINS / cell['width']),
+                                                minlength=SUB_BINS)
+                    cell['vmin'] = min(cell['vmin'], inside.min())
+                    cell['vmax'] = max(cell['vmax'], inside.max())
+
+        children = []
+        for cell in cells:
+            if cell['gather']:
+                gathered = np.sort(np.concatenate(cell['parts']))
+                for i, rank in cell['ranks']:
+                    values_out[i] = gathered[rank]
+            elif cell['vmin'] == cell['vmax']:
+                # A spike of one repeated value: no need to look further
+                for i, _ in cell['ranks']:
+                    values_out[i] = cell['vmin']
+            else:
+                scale = SUB_BINS / cell['width']
+                fine_cum = cell['fine'].cumsum()
+                split = {}
+                for i, rank in cell['ranks']:
+                    sub_bin = int(np.searchsorted(fine_cum, rank, side='right'))
+                    start = fine_cum[sub_bin] - cell['fine'][sub_bin]
+                    split.setdefault(sub_bin, []).append((i, int(rank - start)))
+                for sub_bin, held in split.items():
+                    children.append({'coarse': cell['coarse'], 'path': cell['path'] + [(cell['low'], scale, sub_bin)],
+                                     'low': cell['low'] + sub_bin / scale, 'width': cell['width'] / SUB_BINS,
+                                     'count': int(cell['fine'][sub_bin]), 'ranks': held})
+        cells = children
+    return values_out
+
+
+def percentiles(hist, qs):
+    """
+    Percentiles qs (0-100) from one histogram, interpolated like np.percentile
+    Ask for all needed percentiles in one call: float bands then share their refinement passes
+    """
+    qs = np.asarray(qs, dtype=np.float64)
+    if hist['n'] == 0:
+        return np.full(qs.shape, np.nan)
+    ranks = qs.ravel() / 100 * (hist['n'] - 1)
+    lower = np.floor(ranks).astype(np.int64)
+    upper = np.minimum(lower + 1, hist['n'] - 1)
+    needed = np.unique(np.concatenate([lower, upper]))
+    values = _order_statistics(hist, needed)
+    a = values[np.searchsorted(needed, lower)]
+    b = values[np.searchsorted(needed, upper)]
+    t = ranks - lower
+    # np.percentile's lerp, stable at both ends
+    result = np.where(t >= 0.5, b - (b - a) * (1 - t), a + (b - a) * t)
+    return result.reshape(qs.shape)
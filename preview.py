@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Fast previews: run a filter on a decimated level of the raster
+
+    python preview.py gamma Image_HW2.tif --param gamma=1.5 --max-size 1024
+
+Levels are decimated reads: GDAL serves them from the GeoTIFF's overviews when
+it has them. Otherwise each level is averaged once from the nearest finer cached
+level (or the full raster) and kept as a sidecar GeoTIFF in a .preview_cache
+folder next to the input, so later previews of the same file, in any process,
+read only the small level. The full-resolution raster is never cached and the
+input is never modified. Pixel-length parameters (sigma, window and tile sizes,
+radii) are scaled to the level, so the preview matches the full-resolution look.
+One exception: CLAHE costs one histogram per tile, and scaling its tile size keeps
+the tile count of the full raster, so previews use at most MAX_PREVIEW_TILES
+tiles. Small tile sizes then preview with coarser local contrast than the
+full-resolution result. Render the full-resolution product once the parameters
+are final.
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import rasterio
+from affine import Affine
+from rasterio.enums import Resampling
+
+from filter_registry import (FILTERS, default_params, kernel_params, load_function, load_kernel, parse_params,
+                             scale_params, stats_params)
+from pansharpening_methods import split_pan
+
+CACHE_DIR = '.preview_cache'
+# Filters whose cost grows with a tile count, and the parameter setting the tile side
+TILE_PARAMS = {'clahe': 'tile_size'}
+MAX_PREVIEW_TILES = 4096
+
+
+def level_for_size(width, height, max_size):
+    """
+    Smallest decimation level (factor 2**level) whose larger side fits max_size
+    """
+    level = 0
+    while max(width, height) >> level > max_size:
+        level += 1
+    return level
+
+
+def level_shape(src, level):
+    return src.count, max(1, src.height >> level), max(1, src.width >> level)
+
+
+def sidecar_path(infile, level):
+    """
+    Cached decimated level of infile, in a .preview_cache folder next to it
+    """
+    folder, name = os.path.split(os.path.abspath(infile))
+    return os.path.join(folder, CACHE_DIR, f'{os.path.splitext(name)[0]}_L{level}.tif')
+
+
+def _fresh_sidecar(infile, level):
+    path = sidecar_path(infile, level)
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(infile):
+        return path
+    return None
+
+
+def _decimated_read(path, shape):
+    with rasterio.open(path) as src:
+        return src.read(out_shape=shape, resampling=Resampling.average, out_dtype='float32')
+
+
+def _write_sidecar(infile, level, data):
+    """
+    Store a level next to the input; skipped silently where the folder is not writable
+    """
+    path = sidecar_path(infile, level)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with rasterio.open(infile) as src:
+            profile = src.profile.copy()
+            transform = src.transform * Affine.scale(src.width / data.shape[-1], src.height / data.shape[-2])
+        profile.update(count=data.shape[0], height=data.shape[-2], width=data.shape[-1],
+                       dtype=rasterio.float32, transform=transform, nodata=None)
+        for key in ('blockxsize', 'blockysize', 'tiled', 'photometric'):
+            profile.pop(key, None)
+        with rasterio.open(path, 'w', **profile) as dst:
+            dst.write(data)
+    except OSError:
+        pass
+
+
+def read_level(infile, level):
+    """
+    All bands decimated by 2**level as float32, from overviews, the sidecar cache,
+    or an averaged read of the nearest finer cached level
+    """
+    with rasterio.open(infile) as src:
+        shape = level_shape(src, level)
+        if level == 0:
+            return src.read(out_dtype='float32')
+        if src.overviews(1):
+            # GDAL serves the read from the nearest overview
+            return src.read(out_shape=shape, resampling=Resampling.average, out_dtype='float32')
+
+    cached = _fresh_sidecar(infile, level)
+    if cached is not None:
+        with rasterio.open(cached) as src:
+            return src.read(out_dtype='float32')
+
+    source = infile
+    for finer in range(level - 1, 0, -1):
+        source = _fresh_sidecar(infile, finer) or source
+        if source != infile:
+            break
+    data = _decimated_read(source, shape)
+    _write_sidecar(infile, level, data)
+    return data
+
+
+def build_preview_levels(infile, levels=(1, 2, 3, 4, 5)):
+    """
+    Fill the sidecar cache of infile ahead of time; the input itself is not modified
+    """
+    for level in sorted(levels):
+        read_level(infile, level)
+    print(f"Preview levels {[2 ** level for level in levels]} cached in {os.path.dirname(sidecar_path(infile, 1))}")
+
+
+def limit_tiles(name, params, shape):
+    """
+    Raise a tile-size parameter so a level of `shape` (rows, cols) holds at most MAX_PREVIEW_TILES tiles
+    """
+    key = TILE_PARAMS.get(name)
+    if key is None or params.get(key) is None:
+        return params
+    smallest = int(np.ceil(np.sqrt(shape[0] * shape[1] / MAX_PREVIEW_TILES)))
+    return dict(params, **{key: max(params[key], smallest)})
+
+
+def preview(name, infile, params=None, level=None, max_size=1024):
+    """
+    Run a registered filter at a decimated level
+    Returns (result, level, scaled params); the level is picked from max_size unless given
+    """
+    params = dict(default_params(name), **(params or {}))
+    if level is None:
+        with rasterio.open(infile) as src:
+            level = level_for_size(src.width, src.height, max_size)
+
+    data = read_level(infile, level)
+    scaled = limit_tiles(name, scale_params(name, params, 2 ** level), data.shape[-2:])
+    kernel, stats_function = load_kernel(name)
+    spec = FILTERS[name]
+    kwargs = kernel_params(name, scaled)
+
+    if spec.get('cube'):
+        pan_data = None
+        if params.get('pan_file'):
+            pan_data = read_level(params['pan_file'], level)[0]
+        pan_data, ms_bands = split_pan(data, pan_data)
+        result = kernel(ms_bands, pan_data, **kwargs)
+    elif spec.get('cube_kernel'):
+        result = load_function(name, 'cube_kernel')(data, **kwargs)
+    elif stats_function is not None:
+        # Statistics (ranges, percentiles, CDFs) come from the level itself, with their own parameters (bins)
+        extra = stats_params(name, scaled)
+        result = np.stack([kernel(band, stats=stats_function(band, **extra), **kwargs) for band in data])
+    else:
+        result = np.stack([kernel(band, **kwargs) for band in data])
+    return np.asarray(result, dtype=np.float32), level, scaled
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Preview a filter on a decimated level')
+    parser.add_argument('filter', choices=sorted(FILTERS), help='filter name')
+    parser.add_argument('infile', type=str, help='input GeoTIFF')
+    parser.add_argument('--param', action='append', default=[], help='filter parameter as key=value (repeatable)')
+    parser.add_argument('--max-size', type=int, default=1024, help='largest preview side in pixels')
+    parser.add_argument('--level', type=int, default=None, help='decimation level (factor 2**level), overrides --max-size')
+    parser.add_argument('--outfile', type=str, default=None, help='preview GeoTIFF (default: <stem>_preview_<filter>.tif)')
+    parser.add_argument('--build-cache', action='store_true',
+                        help='cache all decimated levels next to the input first (the input is not modified)')
+    args = parser.parse_args()
+
+    if args.build_cache:
+        build_preview_levels(args.infile)
+
+    start_time = time.time()
+    result, level, scaled = preview(args.filter, args.infile, parse_params(args.filter, args.param),
+                                    args.level, args.max_size)
+    outfile = args.outfile or f"{os.path.splitext(args.infile)[0]}_preview_{args.filter}.tif"
+
+    with rasterio.open(args.infile) as src:
+        profile = src.profile.copy()
+        transform = src.transform * Affine.scale(src.width / result.shape[-1], src.height / result.shape[-2])
+    profile.update(count=result.shape[0], height=result.shape[-2], width=result.shape[-1],
+                   dtype=rasterio.float32, transform=transform)
+    for key in ('blockxsize', 'blockysize', 'tiled'):
+        profile.pop(key, None)
+    with rasterio.open(outfile, 'w', **profile) as dst:
+        dst.write(result)
+
+    print(f"Preview of {args.filter} at level {level} ({result.shape[-1]}x{result.shape[-2]}) "
+          f"with {scaled} in {time.time() - start_time:.2f} seconds, saved as {outfile}")
@@ -0,0 +1,87 @@
+import numpy as np
+from rasterio.windows import Window
+
+
+def iter_windows(width, height, block_size=512):
+    """
+    Yield block_size x block_size windows covering the raster, row by row
+    """
+    for row_off in range(0, height, block_size):
+        for col_off in range(0, width, block_size):
+            yield Window(col_off, row_off,
+                         min(block_size, width - col_off),
+                         min(block_size, height - row_off))
+
+
+def grow_window(src, window, halo):
+    """
+    The window grown by `halo` and clipped to the raster, plus the np.pad widths
+    ((top, bottom), (left, right)) that restore the parts outside the raster
+    """
+    col_off, row_off = int(window.col_off), int(window.row_off)
+    width, height = int(window.width), int(window.height)
+
+    col_start = max(col_off - halo, 0)
+    row_start = max(row_off - halo, 0)
+    col_stop = min(col_off + width + halo, src.width)
+    row_stop = min(row_off + height + halo, src.height)
+
+    grown = Window(col_start, row_start, col_stop - col_start, row_stop - row_start)
+    pad = [
+        (row_start - (row_off - halo), (row_off + height + halo) - row_stop),
+        (col_start - (col_off - halo), (col_off + width + halo) - col_stop)
+    ]
+    return grown, pad
+
+
+def pad_grown(data, pad, mode='symmetric'):
+    if data.ndim == 3:
+        pad = [(0, 0)] + pad
+    if any(before or after for before, after in pad):
+        # scipy 'reflect' (d c b a | a b c d) is numpy 'symmetric'
+        data = np.pad(data, pad, mode=mode)
+    return data
+
+
+def read_with_halo(src, indexes, window, halo, mode='symmetric'):
+    """
+    Read a window grown by `halo` pixels on every side as float32
+    Parts of the halo outside the raster are mirrored like scipy.ndimage mode='reflect'
+    (numpy 'symmetric'; pass mode='reflect' for kernels that pad with np.pad(mode='reflect')),
+    so filtering the result and cropping the halo matches filtering the full band
+    """
+    grown, pad = grow_window(src, window, halo)
+    data = src.read(indexes, window=grown, out_dtype='float32')
+    return pad_grown(data, pad, mode)
+
+
+def crop_halo(data, halo):
+    """
+    Drop the halo added by read_with_halo
+    """
+    if halo == 0:
+        return data
+    return data[..., halo:-halo, halo:-halo]
+
+
+def dtype_range(dtype):
+    """
+    Representable (min, max) of a raster dtype, used to clip before casting back
+    """
+    try:
+        npdtype = np.dtype(dtype)
+        if np.issubdtype(npdtype, np.integer):
+            info = np.iinfo(npdtype)
+        else:
+            info = np.finfo(npdtype)
+        return info.min, info.max
+    except Exception:
+        return 0, 65535
+
+
+def band_range_stats(band):
+    """
+    Whole-band (min, max) for filters that normalize by the band range
+    Passed back as `stats` so a window of the band is scaled like the whole band
+    """
+    return {'min': band.min(), 'max': band.max()}
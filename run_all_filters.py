@@ -23,6 +23,7 @@ def run_all_filters():
         "histogram_equalization.py",
         "contrast_stretching.py",
         "bilateral_filter.py",
+        "guided_filter.py",
         "adaptive_histogram_equalization.py",
         "gamma_log_transforms.py",
         "advanced_edge_filters.py",
@@ -108,7 +109,8 @@ def analyze_results():
         "Noise Reduction": [
             "gaussian_blur_filter.py - Simple noise reduction",
             "median_filter.py - Salt-and-pepper noise removal", 
-            "bilateral_filter.py - Edge-preserving smoothing"
+            "bilateral_filter.py - Edge-preserving smoothing",
+            "guided_filter.py - Fast edge-preserving smoothing, any radius"
         ],
         "Contrast Enhancement": [
             "histogram_equalization.py - Global contrast improvement",
@@ -0,0 +1,110 @@
+import numpy as np
+import rasterio
+from contextlib import ExitStack
+from scipy.ndimage import uniform_filter, convolve
+
+from raster_tiles import dtype_range
+
+# Mean of the 4 direct neighbours; the Laplacian kernel is 4 * (identity - this)
+CROSS_KERNEL = np.array([
+    [0, 1, 0],
+    [1, 0, 1],
+    [0, 1, 0]
+], dtype=np.float32) / 4.0
+
+
+def blur_pyramid(band, box=True, cross=True):
+    """
+    Blurred versions of a band that the 3x3 sharpening kernels are built from
+    box3   - 3x3 box mean (unsharp mask, highboost, highpass)
+    cross4 - mean of the 4 direct neighbours (Laplacian)
+    """
+    blurs = {}
+    if box:
+        blurs['box3'] = uniform_filter(band, size=3, mode='reflect')
+    if cross:
+        blurs['cross4'] = convolve(band, CROSS_KERNEL, mode='reflect')
+    return blurs
+
+
+def highboost_from_blurs(band, blurs, k=1.5):
+    """
+    Highboost = Original + k * (Original - box3), same as highboost_unsharp.highboost_band
+    """
+    return band + k * (band - blurs['box3'])
+
+
+def highpass_from_blurs(band, blurs):
+    """
+    The highpass kernel (8 centre, -1 around, / 9) is identity minus the 3x3 box mean
+    """
+    return band - blurs['box3']
+
+
+def laplacian_from_blurs(band, blurs, alpha=0.5):
+    """
+    Enhanced = Original + alpha * Laplacian(Original), Laplacian = 4 * (Original - cross4)
+    """
+    return band + (4.0 * alpha) * (band - blurs['cross4'])
+
+
+def sharpening_products(infile='Image_HW2.tif', ks=(1.5,), alphas=(0.2, 0.5, 0.8, 1.0), highpass=True, bands=(1,)):
+    """
+    Generate all highboost, highpass and Laplacian products from one blur pass per band
+    Output names and formats follow the single-filter scripts: highboost writes one file
+    per band in `bands` and k, clipped to the source dtype; the others all bands as float32
+    """
+    outputs = []
+    for b in bands:
+        for k in ks:
+            outputs.append(('highboost', k, b, f'Image_HW2_B{b}_highboost_k{float(k):.2f}.tif'))
+    for alpha in alphas:
+        outputs.append(('laplacian', alpha, None, f'Image_HW2_laplacian_alpha{alpha:.1f}.tif'))
+    if highpass:
+        outputs.append(('highpass', None, None, 'Image_HW2_highpass.tif'))
+
+    with rasterio.open(infile) as src, ExitStack() as stack:
+        destinations = []
+        for product, param, band_index, outfile in outputs:
+            profile = src.profile.copy()
+            if band_index is None:
+                profile.update(dtype=rasterio.float32)
+            else:
+                profile.update(count=1, dtype=src.dtypes[band_index - 1])
+            dst = stack.enter_context(rasterio.open(outfile, 'w', **profile))
+            destinations.append((product, param, band_index, dst))
+
+        for b in range(1, src.count + 1):
+            need_box = highpass or (len(ks) > 0 and b in bands)
+            need_cross = len(alphas) > 0
+            if not (need_box or need_cross):
+                continue
+            band = src.read(b).astype(np.float32)
+            blurs = blur_pyramid(band, box=need_box, cross=need_cross)
+
+            for product, param, band_index, dst in destinations:
+                if product == 'highboost':
+                    if band_index != b:
+                        continue
+                    npdtype = np.dtype(src.dtypes[b - 1])
+                    min_val, max_val = dtype_range(npdtype)
+                    result = highboost_from_blurs(band, blurs, k=param)
+                    dst.write(np.clip(result, min_val, max_val).astype(npdtype), 1)
+                    continue
+                if product == 'laplacian':
+                    result = laplacian_from_blurs(band, blurs, alpha=param)
+                else:
+                    result = highpass_from_blurs(band, blurs)
+                dst.write(result.astype(np.float32), b)
+
+    for _, _, _, outfile in outputs:
+        print(f"Sharpening product saved as {outfile}")
+    return [outfile for _, _, _, outfile in outputs]
+
+
+def main():
+    # All sharpening products of the single-filter sweeps in one pass
+    sharpening_products(ks=[1.5, 2.0, 3.0], alphas=[0.2, 0.5, 0.8, 1.0])
+
+if __name__ == '__main__':
+    main()
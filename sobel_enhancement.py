@@ -2,6 +2,37 @@ import numpy as np
 import rasterio
 from scipy.ndimage import convolve
 
+# Sobel kernels
+SOBEL_X = np.array([
+    [-1, 0, 1],
+    [-2, 0, 2],
+    [-1, 0, 1]
+], dtype=np.float32)
+
+SOBEL_Y = np.array([
+    [-1, -2, -1],
+    [0, 0, 0],
+    [1, 2, 1]
+], dtype=np.float32)
+
+def sobel_enhance_band(band, alpha=0.5):
+    grad_x = convolve(band, SOBEL_X, mode='reflect')
+    grad_y = convolve(band, SOBEL_Y, mode='reflect')
+    gradient_magnitude = np.sqrt(grad_x**2 + grad_y**2)
+    return band + alpha * gradient_magnitude
+
+def sobel_enhance_cube(data, alpha=0.5, out=None, band_axis=0):
+    """
+    All bands in one convolve call per gradient; the magnitude is built in place in `out`
+    band_axis=-1 for band-interleaved-by-pixel arrays (rows, cols, bands)
+    """
+    grad_x = convolve(data, np.expand_dims(SOBEL_X, band_axis), output=out, mode='reflect')
+    grad_y = convolve(data, np.expand_dims(SOBEL_Y, band_axis), mode='reflect')
+    np.hypot(grad_x, grad_y, out=grad_x)
+    grad_x *= alpha
+    grad_x += data
+    return grad_x
+
 def sobel_edge_enhancement(infile='Image_HW2.tif', alpha=0.5, outfile=None):
     """
     Sobel edge enhancement filter combining horizontal and vertical gradients
@@ -11,31 +42,14 @@ def sobel_edge_enhancement(infile='Image_HW2.tif', alpha=0.5, outfile=None):
     
     with rasterio.open(infile) as src:
         profile = src.profile.copy()
-        data = src.read().astype(np.float32)
-    
-    # Sobel kernels
-    sobel_x = np.array([
-        [-1, 0, 1],
-        [-2, 0, 2],
-        [-1, 0, 1]
-    ], dtype=np.float32)
-    
-    sobel_y = np.array([
-        [-1, -2, -1],
-        [0, 0, 0],
-        [1, 2, 1]
-    ], dtype=np.float32)
+        data = src.read(out_dtype='float32')
     
     enhanced = np.empty_like(data)
-    for b in range(data.shape[0]):
-        grad_x = convolve(data[b], sobel_x, mode='reflect')
-        grad_y = convolve(data[b], sobel_y, mode='reflect')
-        gradient_magnitude = np.sqrt(grad_x**2 + grad_y**2)
-        enhanced[b] = data[b] + alpha * gradient_magnitude
+    sobel_enhance_cube(data, alpha, out=enhanced)
     
     profile.update(dtype=rasterio.float32)
     with rasterio.open(outfile, 'w', **profile) as dst:
-        dst.write(enhanced.astype(np.float32))
+        dst.write(enhanced)
     
     print(f"Sobel enhancement applied with alpha={alpha}, saved as {outfile}")
     return outfile
@@ -0,0 +1,152 @@
+"""
+Tiled filter runner that overlaps reading, computing and writing
+
+Windows are read ahead into a bounded queue and results wait in a bounded
+write queue, so decompression, filtering and compression run at the same time
+instead of alternating. Reads and writes each get one thread (a rasterio
+dataset must not be used from two threads at once); filtering runs on a
+pool of compute threads, where numpy and scipy.ndimage release the GIL.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import rasterio
+
+from filter_registry import FILTERS, default_params, filter_halo, output_name
+from raster_tiles import iter_windows
+from masking import has_mask, output_nodata
+from memory_planner import gdal_env, measure_peak, plan_tiled, report
+from window_filters import compute_filter_window, filter_stats, output_band_count, read_filter_window
+
+_DONE = object()
+
+
+async def run_tiled_async(name, infile, outfile=None, params=None, block_size=512,
+                          prefetch=4, pending_writes=4, compute_workers=None, pan_file=None,
+                          mask_aware=False):
+    """
+    Filter infile window by window with read -> compute -> write overlapped
+    prefetch and pending_writes bound the windows held in memory on each side of compute
+    mask_aware skips windows without valid pixels and keeps nodata out of the filtering
+    """
+    params = dict(default_params(name), **(params or {}))
+    if FILTERS[name].get('cube'):
+        pan_file = pan_file or params.get('pan_file')
+    if outfile is None:
+        outfile = output_name(name, infile, params)
+    compute_workers = compute_workers or os.cpu_count() or 1
+
+    loop = asyncio.get_running_loop()
+    read_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='read')
+    write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='write')
+    compute_executor = ThreadPoolExecutor(max_workers=compute_workers, thread_name_prefix='compute')
+    read_queue = asyncio.Queue(maxsize=prefetch)
+    write_queue = asyncio.Queue(maxsize=pending_writes)
+
+    src = await loop.run_in_executor(read_executor, rasterio.open, infile)
+    pan_src = await loop.run_in_executor(read_executor, rasterio.open, pan_file) if pan_file else None
+    dst = None
+
+    if filter_halo(name, params) is None:
+        # Whole-band filters (CLAHE) get a single window covering the raster
+        block_size = max(src.width, src.height)
+
+    async def reader():
+        for window in iter_windows(src.width, src.height, block_size):
+            inputs = await loop.run_in_executor(read_executor, read_filter_window,
+                                                src, name, window, params, None, pan_src, mask_aware)
+            await read_queue.put(inputs)
+        for _ in range(compute_workers):
+            await read_queue.put(_DONE)
+
+    async def computer():
+        while True:
+            inputs = await read_queue.get()
+            if inputs is _DONE:
+                await write_queue.put(_DONE)
+                return
+            if inputs.get('empty'):
+                # Nothing valid: no compute, the writer fills the window with nodata
+                await write_queue.put((inputs['window'], None))
+                continue
+            result = await loop.run_in_executor(compute_executor, compute_filter_window,
+                                                name, inputs, params, stats, nodata)
+            await write_queue.put((inputs['window'], result))
+
+    def open_output(count):
+        profile = src.profile.copy()
+        profile.update(count=count, dtype=rasterio.float32)
+        if masked:
+            profile.update(nodata=nodata)
+        if block_size % 16 == 0 and block_size < max(src.width, src.height):
+            # One output tile per window, so each window is compressed exactly once
+            profile.update(tiled=True, blockxsize=block_size, blockysize=block_size)
+        return rasterio.open(outfile, 'w', **profile)
+
+    def write(window, result):
+        if result is None:
+            result = np.full((dst.count, int(window.height), int(window.width)), nodata, dtype=np.float32)
+        dst.write(result, window=window)
+
+    async def writer():
+        finished = 0
+        while finished < compute_workers:
+            item = await write_queue.get()
+            if item is _DONE:
+                finished += 1
+                continue
+            await loop.run_in_executor(write_executor, write, *item)
+
+    try:
+        masked = mask_aware and has_mask(src)
+        nodata = output_nodata(src)
+        stats = await loop.run_in_executor(read_executor, filter_stats, src, name, params, None, pan_src, mask_aware)
+        count = await loop.run_in_executor(read_executor, output_band_count, src, name, params, pan_src, stats)
+        dst = await loop.run_in_executor(write_executor, open_output, count)
+        tasks = [asyncio.ensure_future(reader()), asyncio.ensure_future(writer())]
+        tasks += [asyncio.ensure_future(computer()) for _ in range(compute_workers)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+    finally:
+        if dst is not None:
+            await loop.run_in_executor(write_executor, dst.close)
+        await loop.run_in_executor(read_executor, src.close)
+        if pan_src is not None:
+            await loop.run_in_executor(read_executor, pan_src.close)
+        for executor in (read_executor, write_executor, compute_executor):
+            executor.shutdown(wait=True)
+
+    return outfile
+
+
+def run_tiled(name, infile, outfile=None, params=None, block_size=512,
+              prefetch=4, pending_writes=4, compute_workers=None, pan_file=None, mask_aware=False,
+              max_memory=None):
+    """
+    Synchronous wrapper around run_tiled_async
+    max_memory (bytes of peak RSS) lets the memory planner choose block size, workers and queue depths,
+    and caps GDAL's block cache for the run
+    """
+    plan = None
+    if max_memory is not None:
+        plan = plan_tiled(name, infile, params, max_memory, compute_workers, prefetch, pending_writes)
+        block_size, compute_workers = plan['block_size'], plan['workers']
+        prefetch, pending_writes = plan['prefetch'], plan['pending_writes']
+
+    start_time = time.time()
+    with measure_peak() as measured, (gdal_env(plan) if plan is not None else nullcontext()):
+        outfile = asyncio.run(run_tiled_async(name, infile, outfile, params, block_size,
+                                              prefetch, pending_writes, compute_workers, pan_file, mask_aware))
+    print(f"{name} applied by tiles in {time.time() - start_time:.2f} seconds, saved as {outfile}")
+    if plan is not None:
+        print(report(plan, measured['peak']))
+    return outfile
@@ -0,0 +1,155 @@
+"""
+Run any registered filter on a window of an open raster
+
+Reading (read_filter_window) and computing (compute_filter_window) are separate
+steps so callers can overlap I/O with compute. Filters that normalize by
+whole-band statistics get them from filter_stats, computed once per raster.
+
+With mask_aware=True nodata is honoured: windows without valid pixels are not
+read or filtered, statistics skip nodata, and invalid pixels are filled from
+valid neighbours before filtering and set to nodata in the result.
+"""
+
+import numpy as np
+from rasterio.windows import Window
+
+from filter_registry import FILTERS, filter_halo, kernel_params, load_function, load_kernel, stats_params
+from masking import fill_invalid, has_mask, read_valid_with_halo
+from pansharpening_methods import split_pan
+from raster_tiles import crop_halo, read_with_halo
+
+
+def filter_stats(src, name, params, bands=None, pan_src=None, mask_aware=False):
+    """
+    Whole-raster statistics of a filter: {band: stats} ({0: stats} for cube filters),
+    or None if the filter's kernel needs none
+    """
+    spec = FILTERS[name]
+    _, stats_function = load_kernel(name)
+    if stats_function is None:
+        return None
+    extra = stats_params(name, params)
+    masked = mask_aware and has_mask(src)
+    valid = src.dataset_mask() > 0 if masked and not spec.get('raster_stats') else None
+
+    if spec.get('cube'):
+        ms_data = src.read(out_dtype='float32')
+        pan_data = pan_src.read(1, out_dtype='float32') if pan_src is not None else None
+        _, ms_bands = split_pan(ms_data, pan_data)
+        if valid is not None:
+            ms_bands = ms_bands[:, valid]
+        return {0: stats_function(ms_bands, **extra)}
+
+    bands = bands or range(1, src.count + 1)
+    raster_stats = load_function(name, 'raster_stats')
+    if raster_stats is not None:
+        # Streamed block by block, no whole band in memory
+        return {b: raster_stats(src, b, masked=masked, **extra) for b in bands}
+
+    stats = {}
+    for b in bands:
+        band = src.read(b, out_dtype='float32')
+        if valid is not None:
+            # Spatial statistics (gradients) need the 2-D band, the others only valid values
+            band = fill_invalid(band, valid) if spec.get('spatial_stats') else band[valid]
+        stats[b] = stats_function(band, **extra)
+    return stats
+
+
+def read_filter_window(src, name, window, params, bands=None, pan_src=None, mask_aware=False):
+    """
+    Read what the filter needs to produce `window`: each band grown by the filter's halo,
+    the whole band for filters that cannot work on windows, or (pan, MS) for cube filters
+    With mask_aware, windows without valid pixels come back as {'empty': True} unread
+    """
+    spec = FILTERS[name]
+    halo = filter_halo(name, params)
+    mode = spec.get('pad_mode', 'symmetric')
+    inputs = {'window': window, 'halo': 0 if spec.get('cube') else halo}
+
+    valid = None
+    if mask_aware and has_mask(src):
+        if halo is None and not spec.get('cube'):
+            valid = src.dataset_mask() > 0
+            row_off, col_off = int(window.row_off), int(window.col_off)
+            core = valid[row_off:row_off + int(window.height), col_off:col_off + int(window.width)]
+        else:
+            valid = read_valid_with_halo(src, window, inputs['halo'], mode)
+            core = crop_halo(valid, inputs['halo'])
+        if not core.any():
+            return dict(inputs, empty=True, core=core)
+        inputs.update(valid=valid, core=core)
+
+    if spec.get('cube'):
+        ms_data = src.read(window=window, out_dtype='float32')
+        pan_data = pan_src.read(1, window=window, out_dtype='float32') if pan_src is not None else None
+        pan_data, ms_bands = split_pan(ms_data, pan_data)
+        inputs['cube'] = (ms_bands, pan_data)
+        return inputs
+
+    bands = list(bands or range(1, src.count + 1))
+    if spec.get('cube_kernel') and halo is not None:
+        # All bands in one read, filtered in one call
+        inputs['stack'] = (bands, read_with_halo(src, bands, window, halo, mode=mode))
+    elif halo is None:
+        inputs['bands'] = [(b, src.read(b, out_dtype='float32')) for b in bands]
+    else:
+        inputs['bands'] = [(b, read_with_halo(src, b, window, halo, mode=mode)) for b in bands]
+    return inputs
+
+
+def compute_filter_window(name, inputs, params, stats=None, nodata=np.nan):
+    """
+    Apply the filter kernel to the output of read_filter_window, returns float32 (bands, rows, cols)
+    Returns None for empty windows; nodata marks invalid pixels of mask-aware windows
+    """
+    if inputs.get('empty'):
+        return None
+    kernel, _ = load_kernel(name)
+    kwargs = kernel_params(name, params)
+    window = inputs['window']
+    halo = inputs['halo']
+    valid = inputs.get('valid')
+
+    if 'cube' in inputs:
+        if stats is not None:
+            kwargs['stats'] = stats[0]
+        ms_bands, pan_data = inputs['cube']
+        if valid is not None:
+            ms_bands = np.stack([fill_invalid(band, valid) for band in ms_bands])
+            pan_data = fill_invalid(pan_data, valid)
+        result = np.asarray(kernel(ms_bands, pan_data, **kwargs), dtype=np.float32)
+    elif 'stack' in inputs:
+        _, data = inputs['stack']
+        if valid is not None:
+            data = np.stack([fill_invalid(band, valid, halo or 1) for band in data])
+        result = crop_halo(load_function(name, 'cube_kernel')(data, **kwargs), halo)
+    else:
+        rows, cols = int(window.height), int(window.width)
+        result = np.empty((len(inputs['bands']), rows, cols), dtype=np.float32)
+        for i, (b, data) in enumerate(inputs['bands']):
+            band_kwargs = dict(kwargs)
+            if stats is not None:
+                band_kwargs['stats'] = stats[b]
+            if valid is not None:
+                data = fill_invalid(data, valid, halo or 1)
+            filtered = kernel(data, **band_kwargs)
+            if halo is None:
+                row_off, col_off = int(window.row_off), int(window.col_off)
+                result[i] = filtered[row_off:row_off + rows, col_off:col_off + cols]
+            else:
+                result[i] = crop_halo(filtered, halo)
+
+    if valid is not None:
+        result[:, ~inputs['core']] = nodata
+    return result
+
+
+def output_band_count(src, name, params, pan_src=None, stats=None):
+    """
+    Number of bands the filter writes, found by filtering a single pixel
+    """
+    if not FILTERS[name].get('cube'):
+        return src.count
+    inputs = read_filter_window(src, name, Window(0, 0, 1, 1), params, pan_src=pan_src)
+    return compute_filter_window(name, inputs, params, stats).shape[0]